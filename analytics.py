@@ -0,0 +1,76 @@
+from models import db, MonthlyTotal
+
+
+# Months averaged by the rolling average of the outcomes
+ROLLING_WINDOW = 3
+
+
+# Monthly rollup of the user as a DataFrame (month, kind, type, total), read
+# with a single query straight into columns: a few rows per month whatever
+# the number of transactions
+def load_frame(user_id):
+    # pandas is imported on the first use only, like the plotting libraries
+    import pandas as pd
+
+    query = (
+        db.select(MonthlyTotal.month, MonthlyTotal.kind, MonthlyTotal.type, MonthlyTotal.total)
+        .where(MonthlyTotal.user_id == user_id)
+    )
+    return pd.read_sql(query, db.session.connection())
+
+
+# Spending breakdown of the user for the dashboard: totals and share of every
+# type, and the last months with their month over month changes, rolling
+# average of the outcomes and savings rate
+def get_analytics(user_id, months=12):
+    return summarize(load_frame(user_id), months)
+
+
+# Computed with whole column operations (group by, pivot, diff, rolling), no
+# Python loop goes through the rows. The frame has one total per month, kind
+# and type ('YYYY-MM' months), returns only the compact result
+def summarize(frame, months=12, window=ROLLING_WINDOW):
+    import pandas as pd
+
+    analytics = {'categories': {'income': [], 'outcome': []}, 'months': [], 'savings_rate': None}
+    if frame.empty:
+        return analytics
+
+    # Totals per kind and type, largest first
+    by_type = frame.groupby(['kind', 'type'])['total'].sum()
+    for kind in ('income', 'outcome'):
+        if kind in by_type.index:
+            totals = by_type[kind].sort_values(ascending=False)
+            shares = totals / totals.sum()
+            analytics['categories'][kind] = [
+                {'type': transaction_type, 'total': round(total, 2), 'share': round(share, 4)}
+                for transaction_type, total, share in zip(totals.index, totals, shares)
+            ]
+
+    # Income and outcome per month, the months without transactions count as 0
+    monthly = (
+        frame.pivot_table(index='month', columns='kind', values='total', aggfunc='sum', fill_value=0.0)
+        .reindex(columns=['income', 'outcome'], fill_value=0.0)
+    )
+    monthly.index = pd.PeriodIndex(monthly.index, freq='M')
+    monthly = monthly.reindex(pd.period_range(monthly.index.min(), monthly.index.max(), freq='M'), fill_value=0.0)
+
+    monthly['net'] = monthly['income'] - monthly['outcome']
+    monthly['income_change'] = monthly['income'].diff()
+    monthly['outcome_change'] = monthly['outcome'].diff()
+    monthly['outcome_average'] = monthly['outcome'].rolling(window, min_periods=1).mean()
+    monthly['savings_rate'] = monthly['net'] / monthly['income'].where(monthly['income'] > 0)
+
+    # NaN (first month, months without income) is sent as null
+    last = monthly.tail(months).round(4).astype(object)
+    last = last.where(last.notna(), None)
+    analytics['months'] = [
+        {'month': str(month), **values} for month, values in zip(last.index, last.to_dict('records'))
+    ]
+
+    total_income = by_type.get('income', pd.Series(dtype=float)).sum()
+    total_outcome = by_type.get('outcome', pd.Series(dtype=float)).sum()
+    if total_income > 0:
+        analytics['savings_rate'] = round((total_income - total_outcome) / total_income, 4)
+
+    return analytics
@@ -0,0 +1,316 @@
+import math
+from collections import defaultdict
+from datetime import date
+from flask import Blueprint, jsonify, request, abort, current_app, make_response
+from flask_login import login_required, current_user
+from sqlalchemy import bindparam
+from query_budget import query_budget
+from models import db, Income, Outcome
+from queries import get_data_version, get_transactions_page, encode_cursor, decode_cursor, bump_data_version
+from balances import add_rows_to_totals, add_changes, current_values, TRACKED_COLUMNS
+from analytics import get_analytics
+from charts import get_chart_series
+
+# JSON API, the routes use the session of the logged in user
+api = Blueprint('api', __name__, url_prefix='/api/v1')
+
+MODELS = {'income': Income, 'outcome': Outcome}
+
+
+# Page size and cursor of the request (?limit=50&cursor=2024-05-31_income_42)
+def get_page_args():
+    try:
+        limit = int(request.args.get('limit', current_app.config['PAGE_SIZE']))
+        cursor = request.args.get('cursor')
+        cursor = decode_cursor(cursor) if cursor else None
+    except ValueError:
+        abort(400)
+
+    return min(max(limit, 1), current_app.config['MAX_PAGE_SIZE']), cursor
+
+
+# Transactions of the logged in user, newest first, paginated with cursors
+@api.route('/transactions')
+@login_required
+@query_budget(3)
+def list_transactions():
+    limit, cursor = get_page_args()
+    rows, next_cursor = get_transactions_page(current_user.id, limit, cursor)
+
+    return jsonify(
+        transactions=[
+            {
+                'id': row['id'],
+                'kind': row['kind'],
+                'type': row['type'],
+                'amount': row['amount'],
+                'description': row['description'],
+                'date': row['date'].isoformat()
+            }
+            for row in rows
+        ],
+        next_cursor=encode_cursor(next_cursor) if next_cursor else None
+    )
+
+
+# Spending breakdown of the logged in user (?months=12 last months)
+@api.route('/analytics')
+@login_required
+@query_budget(3)
+def analytics():
+    months = request.args.get('months', 12, type=int)
+    return jsonify(get_analytics(current_user.id, min(max(months, 1), 120)))
+
+
+# Series of the dashboard charts of the logged in user, built with a single
+# query of the monthly rollup and cached by version (charts.py). Cached by the
+# browser like the plots: the url has the data version (?v=) and the ETag
+# changes with it
+@api.route('/charts')
+@login_required
+@query_budget(3)
+def charts():
+    data_version = get_data_version(current_user.id)
+    if data_version is None:
+        abort(404)
+    etag = f'charts-{current_user.id}-{data_version}'
+
+    if request.if_none_match.contains(etag):
+        response = make_response('', 304)
+    else:
+        response = jsonify(get_chart_series(current_user.id, data_version))
+
+    response.set_etag(etag)
+    response.cache_control.private = True
+    response.cache_control.max_age = current_app.config['PLOT_MAX_AGE']
+    return response
+
+
+# Creates the transactions of the array in the body, for example
+# [{"kind": "income", "type": "Salary", "amount": 1000, "description": "May", "date": "2024-05-31"}].
+# The rows of each kind are sent in a single multi-row insert (executemany,
+# batched by SQLAlchemy) and the totals are updated once per kind
+@api.route('/transactions', methods=['POST'])
+@login_required
+@query_budget(8)
+def create_transactions():
+    items = get_batch()
+    results = []
+    rows = {kind: [] for kind in MODELS}
+
+    for index, item in enumerate(items):
+        try:
+            kind = read_kind(item)
+            values = {'user_id': current_user.id, 'date': date.today(), **read_fields(kind, item)}
+        except ValueError as error:
+            results.append({'index': index, 'status': 'error', 'error': str(error)})
+            continue
+
+        rows[kind].append((index, values))
+
+    for kind, kind_rows in rows.items():
+        if kind_rows:
+            for index, id in insert_transactions(kind, kind_rows):
+                results.append({'index': index, 'status': 'created', 'kind': kind, 'id': id})
+
+    return commit_batch(results, changed=any(rows.values()))
+
+
+# Inserts the (index, values) rows of one kind and returns the (index, id) of
+# each. SQLite does not return the rows of a multi-row insert in order, the
+# ids are matched by the values returned with them (rows with the same values
+# can take any of their ids, they are the same transaction)
+def insert_transactions(kind, rows):
+    table = MODELS[kind].__table__
+    indexes = defaultdict(list)
+    for index, values in rows:
+        indexes[row_key(values)].append(index)
+
+    inserted = db.session.execute(
+        table.insert().returning(table.c.id, table.c.type, table.c.amount, table.c.description, table.c.date),
+        [values for _, values in rows]
+    )
+    created = [(indexes[row_key(row._mapping)].pop(), row.id) for row in inserted]
+
+    add_rows_to_totals(db.session, kind, [values for _, values in rows])
+    return created
+
+
+def row_key(values):
+    return values['type'], float(values['amount']), values['description'], values['date']
+
+
+# Updates the given fields of the transactions of the array in the body, for
+# example [{"kind": "outcome", "id": 7, "amount": 25.5}]. The transactions
+# that change the same fields are updated by a single executemany, the budget
+# allows one per kind and set of fields (15 sets of the 4 fields per kind)
+@api.route('/transactions', methods=['PATCH'])
+@login_required
+@query_budget(7 + 2 * 15)
+def update_transactions():
+    items = get_batch()
+    transactions = load_transactions(items)
+    results = []
+    # (kind, id) -> fields to change, the later items of the same transaction win
+    changed = {}
+
+    for index, item in enumerate(items):
+        try:
+            kind = read_kind(item)
+            transaction = transactions.get((kind, read_id(item)))
+            if transaction is None:
+                raise ValueError('Transaction not found')
+            fields = read_fields(kind, item, partial=True)
+        except ValueError as error:
+            results.append({'index': index, 'status': 'error', 'error': str(error)})
+            continue
+
+        changed.setdefault((kind, transaction.id), {}).update(fields)
+        results.append({'index': index, 'status': 'updated', 'kind': kind, 'id': transaction.id})
+
+    update_rows(transactions, changed)
+    return commit_batch(results, bool(changed))
+
+
+# Sends the UPDATEs of the changed fields, one executemany per kind and set of
+# fields, and adds the differences to the totals. The loaded transactions are
+# left as they were (the commit expires them)
+def update_rows(transactions, changed):
+    groups = defaultdict(list)
+    totals = []
+    for (kind, id), fields in changed.items():
+        if not fields:
+            continue
+        groups[(kind, tuple(sorted(fields)))].append({'row_id': id, **fields})
+
+        transaction = transactions[(kind, id)]
+        totals.append((-1, kind, *current_values(transaction)))
+        totals.append((1, kind, *[fields.get(name, getattr(transaction, name)) for name in TRACKED_COLUMNS]))
+
+    for (kind, _), rows in groups.items():
+        table = MODELS[kind].__table__
+        db.session.execute(table.update().where(table.c.id == bindparam('row_id')), rows)
+
+    add_changes(db.session, totals)
+
+
+# Deletes the transactions of the array in the body, for example
+# [{"kind": "income", "id": 3}, {"kind": "outcome", "id": 7}]. The flush
+# deletes the rows of each kind with a single executemany
+@api.route('/transactions', methods=['DELETE'])
+@login_required
+@query_budget(9)
+def delete_transactions():
+    items = get_batch()
+    transactions = load_transactions(items)
+    results = []
+    changed = False
+
+    for index, item in enumerate(items):
+        try:
+            kind = read_kind(item)
+            transaction = transactions.pop((kind, read_id(item)), None)
+            if transaction is None:
+                raise ValueError('Transaction not found')
+        except ValueError as error:
+            results.append({'index': index, 'status': 'error', 'error': str(error)})
+            continue
+
+        db.session.delete(transaction)
+        changed = True
+        results.append({'index': index, 'status': 'deleted', 'kind': kind, 'id': item['id']})
+
+    return commit_batch(results, changed)
+
+
+# Array of transactions of the body of a batch request. Only JSON bodies are
+# accepted, browsers never send them cross site without a CORS preflight
+def get_batch():
+    if not request.is_json:
+        abort(415)
+
+    items = request.get_json(silent=True)
+    if isinstance(items, dict):
+        items = items.get('transactions')
+
+    if not isinstance(items, list):
+        abort(400)
+    if len(items) > current_app.config['MAX_BATCH_SIZE']:
+        abort(413)
+
+    return items
+
+
+def read_kind(item):
+    if not isinstance(item, dict) or item.get('kind') not in MODELS:
+        raise ValueError("kind must be 'income' or 'outcome'")
+    return item['kind']
+
+
+def read_id(item):
+    id = item.get('id')
+    if isinstance(id, bool) or not isinstance(id, int):
+        raise ValueError('id must be an integer')
+    return id
+
+
+# Validated fields of a transaction, with partial=True only the present fields
+# are read (updates). Raises ValueError with the message for the client
+def read_fields(kind, item, partial=False):
+    fields = {}
+
+    if not partial or 'type' in item:
+        types = MODELS[kind].type.type.enums
+        if item.get('type') not in types:
+            raise ValueError(f'type must be one of {", ".join(types)}')
+        fields['type'] = item['type']
+
+    if not partial or 'amount' in item:
+        amount = item.get('amount')
+        if isinstance(amount, bool) or not isinstance(amount, (int, float)) or not math.isfinite(amount):
+            raise ValueError('amount must be a number')
+        fields['amount'] = amount
+
+    if not partial or 'description' in item:
+        description = item.get('description')
+        if not isinstance(description, str) or not description or len(description) > 255:
+            raise ValueError('description must be a text of 1 to 255 characters')
+        fields['description'] = description
+
+    if 'date' in item:
+        try:
+            fields['date'] = date.fromisoformat(item['date'])
+        except (TypeError, ValueError):
+            raise ValueError('date must be in the format YYYY-MM-DD')
+
+    return fields
+
+
+# Transactions of the logged in user referenced by the items, one query per kind
+def load_transactions(items):
+    ids = {kind: [] for kind in MODELS}
+    for item in items:
+        try:
+            ids[read_kind(item)].append(read_id(item))
+        except ValueError:
+            pass  # Reported in the results of the item
+
+    transactions = {}
+    for kind, model in MODELS.items():
+        if ids[kind]:
+            query = db.select(model).where(model.user_id == current_user.id, model.id.in_(ids[kind]))
+            for transaction in db.session.scalars(query):
+                transactions[(kind, transaction.id)] = transaction
+
+    return transactions
+
+
+# Every change of the batch is saved with a single commit
+def commit_batch(results, changed):
+    if changed:
+        bump_data_version(current_user.id)
+        db.session.commit()
+
+    results.sort(key=lambda result: result['index'])
+    errors = sum(result['status'] == 'error' for result in results)
+    return jsonify(results=results, errors=errors)
@@ -1,79 +1,127 @@
-from flask import Flask, render_template, flash, redirect, url_for, request
-from forms import LoginForm, RegisterForm, EditUserForm, DeleteUserForm, TransactionForm
+from flask import Flask, Blueprint, Response, render_template, flash, redirect, url_for, request, make_response, abort, current_app, stream_with_context
+from forms import LoginForm, RegisterForm, EditUserForm, DeleteUserForm, TransactionForm, ImportForm, income_choices, outcome_choices
 from models import db, User, Income, Outcome
+from queries import get_totals, get_month_totals, get_data_version, bump_data_version, get_transactions_page, encode_cursor
+from api import api, get_page_args
+from importer import import_statement
+from exporter import export_chunks, gzip_chunks, EXPORT_FORMATS
+from balances import reconcile_balances_command, rebuild_rollups_command
+from user_cache import get_user, invalidate_user
+from charts import get_plot, plot_etag, CHARTS
+from config import Config
+from database import configure_sqlite, stamp_existing_db_command
+from instrumentation import init_instrumentation
+from query_budget import init_query_budget, query_budget
+from profiling import init_profiling
 from flask_login import LoginManager, login_user, logout_user, login_required, current_user
 from flask_migrate import Migrate
 import os
+from datetime import date
 
-# Data Analysis libraries
-import pandas as pd
-import numpy as np
-import matplotlib
-matplotlib.use('Agg')
-import matplotlib.pyplot as plt
-import seaborn as sns
-
-# App initialization
-app = Flask(__name__)
+# Components (initialized by create_app)
 login_manager = LoginManager()
-migrate = Migrate(app, db)
+migrate = Migrate()
+main = Blueprint('main', __name__)
 
-# App configuration
-app.config['SECRET_KEY'] = 'secretKey'
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///fhData.db'
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+# Redirecting to login page and message to not logged in users
+login_manager.login_view = 'main.home'
+login_manager.login_message = 'You need to be logged in to access this page'
 
-# Components initialization
-db.init_app(app)
-login_manager.init_app(app)
+# Month names of the monthly table of the dashboard
+MONTH_NAMES = ['Enero', 'Febrero', 'Marzo', 'Abril', 'Mayo', 'Junio', 'Julio',
+               'Agosto', 'Septiembre', 'Octubre', 'Noviembre', 'Diciembre']
 
-#Crear las tablas
-with app.app_context():
-    db.create_all()
 
-# Redirecting to login page and message to not logged in users
-login_manager.login_view = 'home'
-login_manager.login_message = 'You need to be logged in to access this page'
+# App factory, no database work is done here: the schema is managed with
+# Flask-Migrate (flask db upgrade)
+def create_app(config=None, **overrides):
+    app = Flask(__name__)
+
+    # App configuration: Config, or the given class/object (or its import path,
+    # 'config.ProductionConfig'), plus single values given as keywords
+    app.config.from_object(Config)
+    if config is not None:
+        app.config.from_object(config)
+    app.config.update(overrides)
+
+    # Components initialization
+    db.init_app(app)
+    configure_sqlite(app)
+    migrate.init_app(app, db)
+    login_manager.init_app(app)
+    init_instrumentation(app)
+    init_query_budget(app)
+    init_profiling(app)
+
+    app.register_blueprint(main)
+    app.register_blueprint(api)
+
+    app.cli.add_command(reconcile_balances_command)
+    app.cli.add_command(rebuild_rollups_command)
+    app.cli.add_command(stamp_existing_db_command)
+
+    return app
+
+
+# Loads in the current process everything a worker would load lazily, used by
+# gunicorn --preload so the workers fork from an already warmed parent
+def warm_up(app):
+    # Plotting stack (imported on the first render otherwise), the processes of
+    # the chart pool import it themselves
+    if not app.config['CHART_WORKERS']:
+        from rendering import init_worker
+        init_worker()
+
+    # Compiling the templates
+    for template in app.jinja_env.list_templates():
+        app.jinja_env.get_template(template)
 
-# Global variables
-income_choices = [('Salary', 'Salary'), 
-                  ('Investment', 'Investment'),
-                  ('Bonus', 'Bonus'), 
-                  ('Other', 'Other')]
+    # The connections must never be shared with the forked workers
+    with app.app_context():
+        db.engine.dispose()
 
-outcome_choices = [('Food', 'Food'),
-                   ('Transport', 'Transport'), 
-                   ('Health', 'Health'), 
-                   ('Education', 'Education'), 
-                   ('Entertainment', 'Entertainment'),
-                   ('Other', 'Other')]
 
-# loading user from database
+# loading user from database, the identity is cached by each worker for
+# USER_CACHE_TTL seconds so most requests do not query the user table. The
+# writes and the urls with other username read it again, the user may have been
+# renamed or deleted through other worker
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    ttl = current_app.config['USER_CACHE_TTL']
+    user = get_user(int(user_id), ttl, refresh=request.method not in ('GET', 'HEAD', 'OPTIONS'))
+    username = (request.view_args or {}).get('username')
+    if user is not None and username is not None and username != user.username:
+        user = get_user(user.id, ttl, refresh=True)
+    return user
 
 # Routes definition
-@app.route('/', methods=['GET', 'POST'])
+@main.route('/', methods=['GET', 'POST'])
+@query_budget(3)
 def home():
     login_form = LoginForm()
     if login_form.validate_on_submit():
         user = User.query.filter_by(username=login_form.username.data).first()
         if user and user.check_password(login_form.password.data):
+            # Upgrading the stored hash when the hashing settings changed
+            if user.password_needs_rehash():
+                user.set_password(login_form.password.data)
+                db.session.commit()
+
             login_user(user)
             flash('Login successful', 'success')
-            return redirect(url_for('logged_in', username=current_user.username))
+            return redirect(url_for('main.logged_in', username=current_user.username))
         else:
             flash('User not found', 'error')
-            return redirect(url_for('home'))
+            return redirect(url_for('main.home'))
     return render_template('index.html', form=login_form)
 
-@app.route('/<username>', methods=['GET', 'POST'])
+@main.route('/<username>', methods=['GET', 'POST'])
 @login_required
+@query_budget(5)
 def logged_in(username):
     if username != current_user.username:
         flash('You need to log in first', 'info')
-        return redirect(url_for('home'))
+        return redirect(url_for('main.home'))
     
     # Setting the forms to send to the modals
     income_form = TransactionForm()
@@ -85,65 +133,188 @@ def logged_in(username):
     if request.method == "POST":
         if income_form.validate_on_submit():
             add_income(income_form)
-            return redirect(url_for('logged_in', username=username))
+            return redirect(url_for('main.logged_in', username=username))
         
         elif outcome_form.validate_on_submit():
             add_outcome(outcome_form)
-            return redirect(url_for('logged_in', username=username))
+            return redirect(url_for('main.logged_in', username=username))
 
         else: 
             flash('Faild to complete, check inputs', 'error')
-            return redirect(url_for('logged_in', username=username))
+            return redirect(url_for('main.logged_in', username=username))
 
     
-    incomes = Income.query.filter_by(user_id=current_user.id).all()
-    outcomes = Outcome.query.filter_by(user_id=current_user.id).all()
-
-    total_income = sum([income.amount for income in incomes])
-    total_outcome = sum([outcome.amount for outcome in outcomes])
-
-    # Creating the figure to show the income vs outcome
-    ## Setting the grid style of the plot
-    sns.set_style('whitegrid')
-
-    ## Creating the figure and the axis (barplot)
-    fig = plt.figure(figsize=(10, 5))
-    ax = sns.barplot(
-        x=['Income', 'Outcome'], 
-        y=[total_income, total_outcome], 
-        palette=['green', 'red'],
-        width=0.3  # Ancho de las barras
-    )
-
-    # Add the values to the bars to show the total income and outcome on top of the bars
-    for bar, value in zip(ax.patches, [total_income, total_outcome]):
-        ax.text(  
-            bar.get_x() + bar.get_width() / 2,   
-            bar.get_height(), 
-            f' {value}',                         # Texto a mostrar
-            ha='center',                         # Alineación horizontal
-            va='bottom'                          # Alineación vertical
-        )
-
-    # Seting the title and labels
-    plt.title('Income vs Outcome')
-    plt.ylabel('Amount ($)')
+    # Running totals kept by balances.py, nothing is computed from the transactions
+    totals = get_totals(current_user.id)
+    if totals is None:
+        # Deleted from other session after the identity was cached
+        invalidate_user(current_user.id)
+        logout_user()
+        flash('User not found', 'error')
+        return redirect(url_for('main.home'))
+    total_income, total_outcome, data_version = totals
 
-    # Saving the plot
-    plt.savefig('static/plot.png')
-    plt.close(fig)
+    # Month of the table (?month=YYYY-MM, the current one by default), read
+    # from the monthly rollup
+    month = month_start(request.args.get('month'))
+    month_totals = get_month_totals(current_user.id, month.strftime('%Y-%m'))
 
     return render_template('logged_in.html', 
                            user=current_user, 
                            total_income=total_income, 
                            total_outcome=total_outcome, 
-                           plot_url=url_for('static', filename='plot.png'),
+                           charts_url=url_for('api.charts', v=data_version),
+                           plot_urls={
+                               chart: url_for('main.plot', username=current_user.username, chart=chart, v=data_version)
+                               for chart in CHARTS
+                           },
+                           month=month,
+                           month_name=MONTH_NAMES[month.month - 1],
+                           previous_month=add_months(month, -1).strftime('%Y-%m'),
+                           next_month=add_months(month, 1).strftime('%Y-%m'),
+                           month_totals=month_totals,
+                           income_types=[value for value, _ in income_choices],
+                           outcome_types=[value for value, _ in outcome_choices],
                            income_form=income_form,
                            outcome_form=outcome_form
                            )
 
 
-@app.route('/register', methods=['GET', 'POST'])
+# First day of the month of a 'YYYY-MM' value, the current month when the
+# value is missing or not valid. The years 1 and 9999 are not valid either,
+# the previous/next month links would fall out of the range of date
+def month_start(value):
+    try:
+        year, month = (value or '').split('-')
+        if 1 < int(year) < 9999:
+            return date(int(year), int(month), 1)
+    except ValueError:
+        pass
+    return date.today().replace(day=1)
+
+
+def add_months(month, months):
+    year, index = divmod(month.year * 12 + month.month - 1 + months, 12)
+    return date(year, index + 1, 1)
+
+
+# Plots of the dashboard (?chart=income_outcome, outcome_by_type or
+# monthly_trend), the data version in the url changes every time the
+# transactions of the user change so the browsers can cache each version
+@main.route('/plot/<username>')
+@login_required
+@query_budget(3)
+def plot(username):
+    chart = request.args.get('chart', CHARTS[0])
+    if username != current_user.username or chart not in CHARTS:
+        abort(404)
+
+    data_version = get_data_version(current_user.id)
+    if data_version is None:
+        abort(404)
+    etag = plot_etag(current_user.id, data_version, chart)
+
+    # The browser already has this version, nothing to query or render
+    if request.if_none_match.contains(etag):
+        response = make_response('', 304)
+    else:
+        # The plots are only rendered again when the transactions of the user changed
+        png, rendered = get_plot(
+            current_user.id,
+            data_version,
+            chart,
+            current_app.config['CHART_WORKERS'],
+            current_app.config['CHART_RENDER_WAIT']
+        )
+        response = make_response(png)
+        response.content_type = 'image/png'
+
+        # Previous version (or placeholder) while the new one is rendered, the
+        # browser must ask again instead of caching it as this version
+        if not rendered:
+            response.cache_control.no_store = True
+            return response
+
+    response.set_etag(etag)
+    response.cache_control.private = True
+    response.cache_control.max_age = current_app.config['PLOT_MAX_AGE']
+    return response
+
+
+# History of the transactions of the user, paginated with cursors
+@main.route('/history/<username>')
+@login_required
+@query_budget(3)
+def history(username):
+    if username != current_user.username:
+        flash('You need to log in first', 'info')
+        return redirect(url_for('main.home'))
+
+    limit, cursor = get_page_args()
+    transactions, next_cursor = get_transactions_page(current_user.id, limit, cursor)
+
+    next_url = None
+    if next_cursor:
+        next_url = url_for('main.history', username=username, limit=limit, cursor=encode_cursor(next_cursor))
+
+    return render_template('history.html', transactions=transactions, next_url=next_url)
+
+
+# Import of the transactions of a bank statement (CSV or OFX), the statements
+# grow with the file (one insert and one update of the totals per chunk)
+@main.route('/import/<username>', methods=['GET', 'POST'])
+@login_required
+@query_budget(None, repeats=None)
+def import_transactions(username):
+    if username != current_user.username:
+        flash('You need to log in first', 'info')
+        return redirect(url_for('main.home'))
+
+    import_form = ImportForm()
+
+    if import_form.validate_on_submit():
+        upload = import_form.file.data
+        file_format = 'csv' if upload.filename.lower().endswith('.csv') else 'ofx'
+
+        report = import_statement(current_user.id, upload.stream, file_format, current_app.config['IMPORT_CHUNK_SIZE'])
+
+        flash(f"{report['imported']} transactions imported, {report['skipped']} skipped", 'success')
+        for error in report['errors']:
+            flash(error, 'error')
+        return redirect(url_for('main.history', username=username))
+
+    return render_template('import.html', form=import_form)
+
+
+# Download of every transaction of the user (?format=csv or ?format=jsonl).
+# The file is streamed while it is read from the database, gzip compressed
+# when the client accepts it
+@main.route('/export/<username>')
+@login_required
+@query_budget(2)
+def export_transactions(username):
+    if username != current_user.username:
+        abort(404)
+
+    file_format = request.args.get('format', 'csv')
+    if file_format not in EXPORT_FORMATS:
+        abort(400)
+    mimetype, extension = EXPORT_FORMATS[file_format]
+
+    chunks = export_chunks(current_user.id, file_format, current_app.config['EXPORT_CHUNK_SIZE'])
+    headers = {
+        'Content-Disposition': f'attachment; filename={username}_transactions.{extension}',
+        'Vary': 'Accept-Encoding'
+    }
+    if 'gzip' in request.accept_encodings:
+        chunks = gzip_chunks(chunks)
+        headers['Content-Encoding'] = 'gzip'
+
+    return Response(stream_with_context(chunks), mimetype=mimetype, headers=headers)
+
+
+@main.route('/register', methods=['GET', 'POST'])
+@query_budget(3)
 def register():
 
     register_form = RegisterForm()
@@ -159,21 +330,23 @@ def register():
         db.session.commit()
 
         flash('User registered successfully', 'success')
-        return redirect(url_for('home'))
+        return redirect(url_for('main.home'))
         
     return render_template('register.html', form=register_form)
 
-@app.route('/logout')
+@main.route('/logout')
 @login_required
+@query_budget(2)
 def logout():
     logout_user()
-    return redirect(url_for('home'))
+    return redirect(url_for('main.home'))
 
-@app.route('/edit/<username>', methods=['GET', 'POST'])
+@main.route('/edit/<username>', methods=['GET', 'POST'])
+@query_budget(4)
 def edit_user(username):
     if username != current_user.username:
         flash('You need to log in first', 'error')
-        return redirect(url_for('home'))
+        return redirect(url_for('main.home'))
     
     edit_form = EditUserForm(
         username=current_user.username, 
@@ -181,23 +354,27 @@ def edit_user(username):
         )
 
     if edit_form.validate_on_submit():
-        current_user.username = edit_form.username.data
-        current_user.name = edit_form.name.data
+        # current_user is the cached identity, the changes are done on the stored user
+        user = db.session.get(User, current_user.id)
+        user.username = edit_form.username.data
+        user.name = edit_form.name.data
 
         # Verifying if the user has changed the username, name or password
-        if current_user.username:
-            current_user.username = edit_form.username.data
-        if current_user.name:
-            current_user.name = edit_form.name.data
+        if user.username:
+            user.username = edit_form.username.data
+        if user.name:
+            user.name = edit_form.name.data
         
         db.session.commit()
+        invalidate_user(user.id)
         flash('User updated successfully', 'success')
-        return redirect(url_for('logged_in', username=current_user.username))
+        return redirect(url_for('main.logged_in', username=user.username))
 
     return render_template('edit_user.html', edit_form=edit_form)
 
-@app.route('/delete/<username>', methods=['GET', 'POST'])
+@main.route('/delete/<username>', methods=['GET', 'POST'])
 @login_required
+@query_budget(10)
 def delete_user(username):
 
     delete_form = DeleteUserForm()
@@ -205,7 +382,7 @@ def delete_user(username):
 
     if not user_to_delete:
         flash('User not found', 'error')
-        return redirect(url_for('home'))
+        return redirect(url_for('main.home'))
 
     if delete_form.validate_on_submit():
         
@@ -213,19 +390,21 @@ def delete_user(username):
         action = request.form.get('action')
         
         if action == 'cancel':
-            return redirect(url_for('logged_in', username=current_user.username))
+            return redirect(url_for('main.logged_in', username=current_user.username))
         
         elif action == 'delete':
+            user_id = user_to_delete.id
             db.session.delete(user_to_delete)
             db.session.commit()
+            invalidate_user(user_id)
             flash('User deleted successfully', 'success')
-            return redirect(url_for('home'))
+            return redirect(url_for('main.home'))
         
     return render_template('delete_user.html', user=user_to_delete, form=delete_form)
 
 ## -- Next comented becouse modal was added to logged_in endpoint --
 # Route to add an income
-# @app.route('/add_income/<username>', methods=['GET', 'POST'])
+# @main.route('/add_income/<username>', methods=['GET', 'POST'])
 # @login_required
 def add_income(income_form):
         
@@ -237,14 +416,15 @@ def add_income(income_form):
         )
         
     db.session.add(new_income)
+    bump_data_version(current_user.id)
     db.session.commit()
     flash('Income added successfully', 'success')
-    return redirect(url_for('logged_in', username=current_user.username))
+    return redirect(url_for('main.logged_in', username=current_user.username))
       
     # return render_template('add_income.html', form=income_form)
 
 # Route to add an outcome
-# @app.route('/add_outcome/<username>', methods=['GET', 'POST'])
+# @main.route('/add_outcome/<username>', methods=['GET', 'POST'])
 # @login_required
 def add_outcome(outcome_form):
 
@@ -256,26 +436,30 @@ def add_outcome(outcome_form):
         )
 
     db.session.add(new_outcome)
+    bump_data_version(current_user.id)
     db.session.commit()
     flash('Outcome added successfully', 'success')
-    return redirect(url_for('logged_in', username=current_user.username))
+    return redirect(url_for('main.logged_in', username=current_user.username))
 
 # Functions to delete and edit incomes
-@app.route('/delete_income/<int:id>', methods=['GET', 'POST'])
+@main.route('/delete_income/<int:id>', methods=['GET', 'POST'])
 @login_required
+@query_budget(7)
 def delete_income(id):
     income_to_delete = Income.query.get(id)
     if not income_to_delete:
         flash('Income not found', 'error')
-        return redirect(url_for('logged_in', username=current_user.username))
+        return redirect(url_for('main.logged_in', username=current_user.username))
 
     db.session.delete(income_to_delete)
+    bump_data_version(income_to_delete.user_id)
     db.session.commit()
     flash('Income deleted successfully', 'success')
-    return redirect(url_for('logged_in', username=current_user.username))
+    return redirect(url_for('main.logged_in', username=current_user.username))
 
-@app.route('/edit_income/<int:id>/<transaction_type>', methods=['GET', 'POST'])
+@main.route('/edit_income/<int:id>/<transaction_type>', methods=['GET', 'POST'])
 @login_required
+@query_budget(7)
 def edit_transaction(id, transaction_type):
     
     if transaction_type == 'income':
@@ -286,16 +470,17 @@ def edit_transaction(id, transaction_type):
             description=transaction.description
         )
 
-        transaction_form.type.choices = income_choices # income_choices is a global variable defined at the beginning of this script
+        transaction_form.type.choices = income_choices # income_choices is a global variable defined in forms.py
 
         if transaction_form.validate_on_submit():
             transaction.amount = transaction_form.amount.data
             transaction.type = transaction_form.type.data
             transaction.description = transaction_form.description.data
 
+            bump_data_version(transaction.user_id)
             db.session.commit()
             flash('Income updated successfully', 'success')
-            return redirect(url_for('logged_in', username=current_user.username))
+            return redirect(url_for('main.logged_in', username=current_user.username))
     
     elif transaction_type == 'outcome':
 
@@ -306,39 +491,43 @@ def edit_transaction(id, transaction_type):
             description=transaction.description
         )
         
-        transaction_form.type.choices = outcome_choices # outcome_choices is a global variable defined at the beginning of this script
+        transaction_form.type.choices = outcome_choices # outcome_choices is a global variable defined in forms.py
 
         if transaction_form.validate_on_submit():
             transaction.amount = transaction_form.amount.data
             transaction.type = transaction_form.type.data
             transaction.description = transaction_form.description.data
 
+            bump_data_version(transaction.user_id)
             db.session.commit()
             flash('Outcome updated successfully', 'success')
-            return redirect(url_for('logged_in', username=current_user.username))
+            return redirect(url_for('main.logged_in', username=current_user.username))
 
     return render_template('edit_transaction.html', form=transaction_form)
 
 
-@app.route('/delete_outcome/<int:id>/<transaction_type>', methods=['GET', 'POST'])
+@main.route('/delete_outcome/<int:id>/<transaction_type>', methods=['GET', 'POST'])
 @login_required
+@query_budget(7)
 def delete_transaction(id, transaction_type):
     
     if transaction_type == 'income':
         transaction_to_delete = Income.query.get(id)
         db.session.delete(transaction_to_delete)
+        bump_data_version(transaction_to_delete.user_id)
         db.session.commit()
         flash('Income deleted successfully', 'success')
-        return redirect(url_for('logged_in', username=current_user.username))
+        return redirect(url_for('main.logged_in', username=current_user.username))
     
     elif transaction_type == 'outcome':
         transaction_to_delete = Outcome.query.get(id)
         db.session.delete(transaction_to_delete)
+        bump_data_version(transaction_to_delete.user_id)
         db.session.commit()
         flash('Outcome deleted successfully', 'success')
-        return redirect(url_for('logged_in', username=current_user.username))
+        return redirect(url_for('main.logged_in', username=current_user.username))
     
-    return redirect(url_for('logged_in', username=current_user.username))
+    return redirect(url_for('main.logged_in', username=current_user.username))
 
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=int(os.environ.get("PORT", 5000)))
+    create_app().run(host="0.0.0.0", port=int(os.environ.get("PORT", 5000)))
@@ -0,0 +1,215 @@
+import click
+import math
+from collections import defaultdict
+from datetime import date
+from sqlalchemy import event, inspect, func, literal
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+from models import db, User, Income, Outcome, MonthlyTotal
+
+
+# Difference allowed between the running totals and the sum of the rows, the
+# totals are floats updated one transaction at a time
+TOLERANCE = 0.005
+
+
+# Adds the deltas to the running totals of the user, with an UPDATE done by
+# the database so concurrent workers never lose a change
+def add_to_totals(session, user_id, income=0.0, outcome=0.0):
+    session.connection().execute(
+        User.__table__.update()
+        .where(User.__table__.c.id == user_id)
+        .values(
+            total_income=User.__table__.c.total_income + income,
+            total_outcome=User.__table__.c.total_outcome + outcome
+        )
+    )
+
+
+# Adds the deltas (user_id, month, kind, type, total, count) to the monthly
+# rollup, inserted or updated by a single executemany (SQLite upsert, the app
+# only runs on SQLite), and removes the rows left without transactions
+def add_to_monthly(session, deltas):
+    connection = session.connection()
+    table = MonthlyTotal.__table__
+
+    statement = insert(table)
+    connection.execute(statement.on_conflict_do_update(
+        index_elements=[table.c.user_id, table.c.month, table.c.kind, table.c.type],
+        set_={'total': table.c.total + statement.excluded.total, 'count': table.c.count + statement.excluded.count}
+    ), [
+        {'user_id': user_id, 'month': month, 'kind': kind, 'type': transaction_type, 'total': total, 'count': count}
+        for user_id, month, kind, transaction_type, total, count in deltas
+    ])
+
+    emptied = {user_id for user_id, _, _, _, _, count in deltas if count < 0}
+    if emptied:
+        connection.execute(table.delete().where(table.c.user_id.in_(emptied), table.c.count <= 0))
+
+
+# Running totals and monthly rollup of rows inserted with Core (statement
+# imports), all the rows are of the same kind and user
+def add_rows_to_totals(session, kind, rows):
+    monthly = defaultdict(lambda: [0.0, 0])
+    for row in rows:
+        key = (row['date'].strftime('%Y-%m'), row['type'])
+        monthly[key][0] += row['amount']
+        monthly[key][1] += 1
+
+    user_id = rows[0]['user_id']
+    add_to_totals(session, user_id, **{kind: sum(total for total, _ in monthly.values())})
+    add_to_monthly(session, [
+        (user_id, month, kind, transaction_type, total, count)
+        for (month, transaction_type), (total, count) in monthly.items()
+    ])
+
+
+# Keeps User.total_income / User.total_outcome and the MonthlyTotal rollup up
+# to date: every income or outcome added, edited or deleted through the ORM
+# (forms and JSON API) changes them in the same database transaction. Inserts
+# and updates done with Core (statement imports, JSON API) call
+# add_rows_to_totals / add_changes themselves
+@event.listens_for(Session, 'before_flush')
+def update_totals(session, flush_context, instances):
+    # The rows of the users being deleted are removed with them
+    deleted_users = {user.id for user in session.deleted if isinstance(user, User)}
+
+    changes = []
+    for transaction in session.new:
+        if isinstance(transaction, (Income, Outcome)):
+            changes.append((1, kind_of(transaction), *current_values(transaction)))
+
+    for transaction in session.deleted:
+        if isinstance(transaction, (Income, Outcome)):
+            changes.append((-1, kind_of(transaction), *current_values(transaction)))
+
+    for transaction in session.dirty:
+        if isinstance(transaction, (Income, Outcome)) and session.is_modified(transaction):
+            changes.append((-1, kind_of(transaction), *previous_values(session, transaction)))
+            changes.append((1, kind_of(transaction), *current_values(transaction)))
+
+    add_changes(session, changes, skip_users=deleted_users)
+
+
+# Adds the changes (+1 or -1, kind, user_id, amount, date, type) to the running
+# totals and the monthly rollup, one statement per user for the totals and one
+# for the rollup. The changes of the users in skip_users are left out
+def add_changes(session, changes, skip_users=()):
+    totals = defaultdict(lambda: {'income': 0.0, 'outcome': 0.0})
+    monthly = defaultdict(lambda: [0.0, 0])
+    for sign, kind, user_id, amount, day, transaction_type in changes:
+        if user_id in skip_users:
+            continue
+        amount = amount_value(amount)
+        totals[user_id][kind] += sign * amount
+        key = (user_id, (day or date.today()).strftime('%Y-%m'), kind, transaction_type)
+        monthly[key][0] += sign * amount
+        monthly[key][1] += sign
+
+    for user_id, delta in totals.items():
+        if delta['income'] or delta['outcome']:
+            add_to_totals(session, user_id, **delta)
+
+    deltas = [(*key, total, count) for key, (total, count) in monthly.items() if total or count]
+    if deltas:
+        add_to_monthly(session, deltas)
+
+
+def kind_of(transaction):
+    return 'income' if isinstance(transaction, Income) else 'outcome'
+
+
+# Columns of a transaction that change the totals
+TRACKED_COLUMNS = ('user_id', 'amount', 'date', 'type')
+
+
+def current_values(transaction):
+    return [getattr(transaction, name) for name in TRACKED_COLUMNS]
+
+
+# The forms, the JSON API and the importer only let numbers through, anything
+# else is an error here instead of totals that silently differ from the rows
+def amount_value(value):
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value):
+        raise ValueError(f'amount must be a number, not {value!r}')
+    return float(value)
+
+
+# Tracked columns of a modified transaction before the changes
+def previous_values(session, transaction):
+    state = inspect(transaction)
+    values = []
+    for name in TRACKED_COLUMNS:
+        history = state.attrs[name].history
+        if history.deleted:
+            values.append(history.deleted[0])
+        elif history.added:
+            # Changed without being loaded first, the old value is read from the database
+            model = type(transaction)
+            values.append(session.connection().scalar(
+                db.select(getattr(model, name)).where(model.id == transaction.id)
+            ))
+        else:
+            values.append(getattr(transaction, name))
+    return values
+
+
+# Compares the running totals of every user with the sums of the rows, with
+# fix=True the totals that differ are replaced. Returns the users that differed
+def reconcile_balances(fix=False):
+    sums = {}
+    for kind, model in (('income', Income), ('outcome', Outcome)):
+        query = db.select(model.user_id, func.sum(model.amount)).group_by(model.user_id)
+        for user_id, total in db.session.execute(query):
+            sums.setdefault(user_id, {'income': 0.0, 'outcome': 0.0})[kind] = total or 0.0
+
+    mismatches = []
+    for user in db.session.scalars(db.select(User)):
+        expected = sums.get(user.id, {'income': 0.0, 'outcome': 0.0})
+        if (abs(user.total_income - expected['income']) > TOLERANCE
+                or abs(user.total_outcome - expected['outcome']) > TOLERANCE):
+            mismatches.append((user.username, user.total_income, user.total_outcome, expected))
+            if fix:
+                user.total_income = expected['income']
+                user.total_outcome = expected['outcome']
+
+    if fix:
+        db.session.commit()
+    return mismatches
+
+
+@click.command('reconcile-balances')
+@click.option('--fix', is_flag=True, help='Replace the totals that do not match the transactions.')
+def reconcile_balances_command(fix):
+    """Verify the running totals of the users against their transactions."""
+    mismatches = reconcile_balances(fix)
+    for username, total_income, total_outcome, expected in mismatches:
+        click.echo(
+            f'{username}: income {total_income:.2f} (rows {expected["income"]:.2f}), '
+            f'outcome {total_outcome:.2f} (rows {expected["outcome"]:.2f})'
+        )
+    click.echo(f'{len(mismatches)} users with wrong totals' + (' fixed' if fix and mismatches else ''))
+    if mismatches and not fix:
+        raise SystemExit(1)
+
+
+# Rebuilds the monthly rollup of every user from the transactions
+def rebuild_rollups():
+    db.session.execute(db.delete(MonthlyTotal))
+    for kind, model in (('income', Income), ('outcome', Outcome)):
+        month = func.strftime('%Y-%m', model.date)
+        db.session.execute(
+            db.insert(MonthlyTotal).from_select(
+                ['user_id', 'month', 'kind', 'type', 'total', 'count'],
+                db.select(model.user_id, month, literal(kind), model.type, func.sum(model.amount), func.count())
+                .group_by(model.user_id, month, model.type)
+            )
+        )
+    db.session.commit()
+
+
+@click.command('rebuild-rollups')
+def rebuild_rollups_command():
+    """Rebuild the monthly totals of every user from their transactions."""
+    rebuild_rollups()
+    click.echo(f'{db.session.scalar(db.select(func.count()).select_from(MonthlyTotal))} monthly totals rebuilt')
@@ -0,0 +1,135 @@
+# Benchmark of the spending breakdown at 1M transactions: analytics.py (pandas
+# over the monthly rollup) vs the same vectorized code over every transaction
+# vs the same results computed with per-row Python loops over the transactions
+# Usage: python benchmarks/bench_analytics.py [rows]  (1000000 by default)
+import os
+import sys
+import math
+import time
+import pandas as pd
+from collections import defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import literal, type_coerce, union_all
+from app import create_app
+from config import TestingConfig
+from models import db, User, Income, Outcome
+from analytics import get_analytics, summarize, ROLLING_WINDOW
+from balances import rebuild_rollups
+from bench_summary import seed
+
+MONTHS = 12
+
+
+def transactions_query(user_id):
+    return union_all(*[
+        db.select(
+            type_coerce(model.date, db.String).label('date'),
+            literal(kind).label('kind'),
+            type_coerce(model.type, db.String).label('type'),
+            model.amount
+        )
+        .where(model.user_id == user_id)
+        for kind, model in (('income', Income), ('outcome', Outcome))
+    ])
+
+
+# Vectorized over every transaction: the rows are read into a DataFrame and
+# grouped by month with pandas before the same summary
+def summarize_rows(user_id, months=MONTHS):
+    frame = pd.read_sql(transactions_query(user_id), db.session.connection())
+    rollup = (
+        frame.assign(month=frame['date'].str[:7])
+        .groupby(['month', 'kind', 'type'], as_index=False)['amount'].sum()
+        .rename(columns={'amount': 'total'})
+    )
+    return summarize(rollup, months)
+
+
+# Same results as analytics.summarize, one row at a time
+def summarize_loops(user_id, months=MONTHS, window=ROLLING_WINDOW):
+    by_type = defaultdict(float)
+    monthly = defaultdict(lambda: {'income': 0.0, 'outcome': 0.0})
+    for day, kind, transaction_type, amount in db.session.execute(transactions_query(user_id)):
+        by_type[kind, transaction_type] += amount
+        monthly[int(day[:4]) * 12 + int(day[5:7]) - 1][kind] += amount
+
+    analytics = {'categories': {'income': [], 'outcome': []}, 'months': [], 'savings_rate': None}
+    for kind in ('income', 'outcome'):
+        totals = sorted(((total, t) for (k, t), total in by_type.items() if k == kind), reverse=True)
+        kind_total = sum(total for total, _ in totals)
+        analytics['categories'][kind] = [
+            {'type': t, 'total': round(total, 2), 'share': round(total / kind_total, 4)} for total, t in totals
+        ]
+
+    rows = []
+    for index in range(min(monthly), max(monthly) + 1):
+        values = monthly.get(index, {'income': 0.0, 'outcome': 0.0})
+        previous = rows[-1] if rows else None
+        outcomes = [row['outcome'] for row in rows[-(window - 1):]] + [values['outcome']]
+        net = values['income'] - values['outcome']
+        rows.append({
+            'month': f'{index // 12}-{index % 12 + 1:02d}',
+            'income': values['income'],
+            'outcome': values['outcome'],
+            'net': net,
+            'income_change': values['income'] - previous['income'] if previous else None,
+            'outcome_change': values['outcome'] - previous['outcome'] if previous else None,
+            'outcome_average': sum(outcomes) / len(outcomes),
+            'savings_rate': net / values['income'] if values['income'] > 0 else None
+        })
+    analytics['months'] = [
+        {key: round(value, 4) if isinstance(value, float) else value for key, value in row.items()}
+        for row in rows[-months:]
+    ]
+
+    total_income = sum(total for (kind, _), total in by_type.items() if kind == 'income')
+    total_outcome = sum(total for (kind, _), total in by_type.items() if kind == 'outcome')
+    if total_income > 0:
+        analytics['savings_rate'] = round((total_income - total_outcome) / total_income, 4)
+    return analytics
+
+
+# Both results must be the same (up to the rounding of the float sums)
+def same(a, b):
+    if isinstance(a, dict):
+        return a.keys() == b.keys() and all(same(a[key], b[key]) for key in a)
+    if isinstance(a, list):
+        return len(a) == len(b) and all(same(x, y) for x, y in zip(a, b))
+    if isinstance(a, float) and isinstance(b, float):
+        return math.isclose(a, b, rel_tol=1e-6, abs_tol=1e-3)
+    return a == b
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+
+    app = create_app(TestingConfig)
+    with app.app_context():
+        db.create_all()
+        user = User(username='bench', name='Bench', password='x')
+        db.session.add(user)
+        db.session.commit()
+        seed(user.id, rows)
+        rebuild_rollups()
+
+        timings = {}
+        results = {}
+        for name, function in (
+            ('rollup + pandas', get_analytics),
+            ('rows + pandas', summarize_rows),
+            ('rows + python loops', summarize_loops)
+        ):
+            start = time.perf_counter()
+            results[name] = function(user.id, MONTHS)
+            timings[name] = (time.perf_counter() - start) * 1000
+
+        match = all(same(results['rollup + pandas'], result) for result in results.values())
+        print(f'{rows} transactions, results {"match" if match else "DIFFER"}')
+        for name, elapsed in timings.items():
+            print(f'{name:>20}: {elapsed:>8.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
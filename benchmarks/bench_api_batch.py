@@ -0,0 +1,51 @@
+# Importing N transactions through the HTML form (one POST, redirect and
+# dashboard per row) vs a single batched request to the JSON API
+# Usage: python benchmarks/bench_api_batch.py
+import os
+import sys
+import time
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from config import TestingConfig
+from models import db
+
+BATCH_SIZES = [10, 100, 1000]
+
+
+def login(app, username):
+    client = app.test_client()
+    client.post('/register', data={'username': username, 'name': 'Bench', 'password': 'pw', 'confirm_password': 'pw'})
+    client.post('/', data={'username': username, 'password': 'pw'})
+    return client
+
+
+def main():
+    # File database so every commit pays its real cost
+    uri = f'sqlite:///{os.path.join(tempfile.mkdtemp(), "bench.db")}'
+    app = create_app(TestingConfig, SQLALCHEMY_DATABASE_URI=uri)
+    with app.app_context():
+        db.create_all()
+
+    print(f"{'rows':>6} {'forms (s)':>10} {'api (s)':>10} {'speedup':>8}")
+    for size in BATCH_SIZES:
+        client = login(app, f'forms{size}')
+        start = time.perf_counter()
+        for i in range(size):
+            client.post(f'/forms{size}', data={'amount': '10', 'type': 'Food', 'description': f'row {i}'},
+                        follow_redirects=True)
+        forms = time.perf_counter() - start
+
+        client = login(app, f'api{size}')
+        rows = [{'kind': 'outcome', 'type': 'Food', 'amount': 10, 'description': f'row {i}'} for i in range(size)]
+        start = time.perf_counter()
+        client.post('/api/v1/transactions', json=rows)
+        api = time.perf_counter() - start
+
+        print(f'{size:>6} {forms:>10.3f} {api:>10.3f} {forms / api:>7.0f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+# Microbenchmark of the PNG plot rendering in charts per second: the previous
+# pyplot + seaborn code (styled on every chart) vs a new Figure per chart vs
+# the reused Figure of rendering.py, in one thread and in several threads
+# Usage: python benchmarks/bench_charts.py [seconds per case]  (needs requirements-dev.txt)
+import io
+import os
+import sys
+import time
+import random
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import matplotlib
+matplotlib.use('Agg')
+from rendering import init_worker, render_income_outcome, IncomeOutcomeChart
+
+THREADS = 4
+
+
+# Previous implementation, kept here as the baseline (global pyplot state,
+# only usable from one thread)
+def render_pyplot(total_income, total_outcome):
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
+    sns.set_style('whitegrid')
+    fig = plt.figure(figsize=(10, 5))
+    ax = sns.barplot(x=['Income', 'Outcome'], y=[total_income, total_outcome],
+                     hue=['Income', 'Outcome'], palette=['green', 'red'], legend=False, width=0.3)
+    for bar, value in zip(ax.patches, [total_income, total_outcome]):
+        ax.text(bar.get_x() + bar.get_width() / 2, bar.get_height(), f' {value}', ha='center', va='bottom')
+    plt.title('Income vs Outcome')
+    plt.ylabel('Amount ($)')
+    buffer = io.BytesIO()
+    plt.savefig(buffer, format='png')
+    plt.close(fig)
+    return buffer.getvalue()
+
+
+def render_new_figure(total_income, total_outcome):
+    return IncomeOutcomeChart().render(total_income, total_outcome)
+
+
+# Charts rendered by `threads` threads in `seconds`
+def charts_per_second(render, seconds, threads=1):
+    counts = [0] * threads
+    deadline = time.perf_counter() + seconds
+
+    def run(index):
+        while time.perf_counter() < deadline:
+            render(random.uniform(0, 10000), random.uniform(0, 10000))
+            counts[index] += 1
+
+    workers = [threading.Thread(target=run, args=(index,)) for index in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return sum(counts) / seconds
+
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 3.0
+    init_worker()
+
+    # First render of each case (imports, fonts) out of the measures
+    for render in (render_pyplot, render_new_figure, render_income_outcome):
+        render(1, 1)
+
+    print(f"{'renderer':>22} {'threads':>8} {'charts/s':>10}")
+    for name, render, threads in (
+        ('pyplot + seaborn', render_pyplot, 1),
+        ('new Figure per chart', render_new_figure, 1),
+        ('reused Figure', render_income_outcome, 1),
+        ('new Figure per chart', render_new_figure, THREADS),
+        ('reused Figure', render_income_outcome, THREADS),
+    ):
+        print(f'{name:>22} {threads:>8} {charts_per_second(render, seconds, threads):>10.1f}')
+
+
+if __name__ == '__main__':
+    main()
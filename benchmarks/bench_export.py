@@ -0,0 +1,56 @@
+# Export of a long history: time to the first byte, total time and peak Python
+# memory (tracemalloc) of the streamed download
+# Usage: python benchmarks/bench_export.py [rows]
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from config import TestingConfig
+from models import db
+from bench_summary import seed
+
+
+def download(client, url, gzip):
+    headers = {'Accept-Encoding': 'gzip'} if gzip else {}
+    start = time.perf_counter()
+    response = client.get(url, headers=headers, buffered=False)
+    chunks = iter(response.response)
+    size = len(next(chunks))
+    first_byte = time.perf_counter() - start
+    for chunk in chunks:
+        size += len(chunk)
+    response.close()
+    return first_byte, time.perf_counter() - start, size
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    app = create_app(TestingConfig)
+    with app.app_context():
+        db.create_all()
+    client = app.test_client()
+    client.post('/register', data={'username': 'bench', 'name': 'Bench', 'password': 'pw', 'confirm_password': 'pw'})
+    client.post('/', data={'username': 'bench', 'password': 'pw'})
+    with app.app_context():
+        seed(1, rows)
+
+    print(f'{rows} rows')
+    print(f"{'export':>12} {'first byte (ms)':>16} {'total (s)':>10} {'MB sent':>8} {'peak MB':>8}")
+    for file_format in ['csv', 'jsonl']:
+        for gzip in [False, True]:
+            url = f'/export/bench?format={file_format}'
+            first_byte, total, size = download(client, url, gzip)
+            tracemalloc.start()
+            download(client, url, gzip)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            name = file_format + (' gzip' if gzip else '')
+            print(f'{name:>12} {first_byte * 1000:>16.1f} {total:>10.2f} {size / 1e6:>8.1f} {peak / 1e6:>8.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+# Cost of a page of the transaction history deep in the history: keyset cursor
+# vs OFFSET pagination
+# Usage: python benchmarks/bench_history.py
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from config import TestingConfig
+from models import db, User, Income, Outcome
+from queries import get_transactions_page
+from bench_summary import seed
+
+ROWS = 100000
+PAGE_SIZE = 50
+DEPTHS = [0, 1000, 10000, 50000, 90000]
+
+
+# Same page with OFFSET, what the history would cost without cursors
+def offset_page(user_id, offset):
+    incomes = db.select(Income.id, Income.date).where(Income.user_id == user_id)
+    outcomes = db.select(Outcome.id, Outcome.date).where(Outcome.user_id == user_id)
+    transactions = db.union_all(incomes, outcomes).subquery()
+    return db.session.execute(
+        db.select(transactions)
+        .order_by(transactions.c.date.desc(), transactions.c.id.desc())
+        .limit(PAGE_SIZE).offset(offset)
+    ).all()
+
+
+def main():
+    app = create_app(TestingConfig)
+    with app.app_context():
+        db.create_all()
+        user = User(username='bench', name='Bench', password='x')
+        db.session.add(user)
+        db.session.commit()
+        seed(user.id, ROWS)
+
+        # Cursors of the first row of each depth, found walking the history
+        cursors = {0: None}
+        cursor, depth = None, 0
+        while depth < max(DEPTHS):
+            _, cursor = get_transactions_page(user.id, 1000, cursor)
+            depth += 1000
+            cursors[depth] = cursor
+
+        print(f"{'depth':>8} {'keyset (ms)':>12} {'offset (ms)':>12}")
+        number = 10
+        for depth in DEPTHS:
+            keyset = timeit.timeit(lambda: get_transactions_page(user.id, PAGE_SIZE, cursors[depth]), number=number)
+            offset = timeit.timeit(lambda: offset_page(user.id, depth), number=number)
+            print(f'{depth:>8} {keyset / number * 1000:>12.2f} {offset / number * 1000:>12.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+# Import of a large CSV statement: time and peak Python memory (tracemalloc)
+# Usage: python benchmarks/bench_import.py [rows]
+import os
+import sys
+import random
+import tempfile
+import time
+import tracemalloc
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from config import TestingConfig
+from models import db, User
+from importer import import_statement
+
+CHUNK_SIZES = [500, 5000]
+
+
+def write_statement(path, rows):
+    start = date(2015, 1, 1)
+    types = ['Food', 'Transport', 'Health', 'Education', 'Entertainment', 'Other']
+    with open(path, 'w') as statement:
+        statement.write('date,amount,description,type\n')
+        for i in range(rows):
+            day = start + timedelta(days=random.randint(0, 3650))
+            if random.random() < 0.1:
+                statement.write(f'{day},{random.uniform(500, 5000):.2f},Payment {i},Salary\n')
+            else:
+                statement.write(f'{day},-{random.uniform(1, 300):.2f},Purchase {i},{random.choice(types)}\n')
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    folder = tempfile.mkdtemp()
+    path = os.path.join(folder, 'statement.csv')
+    write_statement(path, rows)
+
+    app = create_app(TestingConfig, SQLALCHEMY_DATABASE_URI=f'sqlite:///{os.path.join(folder, "bench.db")}')
+
+    print(f'{rows} rows, {os.path.getsize(path) / 1e6:.1f} MB')
+    print(f"{'chunk':>6} {'seconds':>8} {'rows/s':>10} {'peak MB':>8}")
+    with app.app_context():
+        db.create_all()
+        for chunk_size in CHUNK_SIZES:
+            # Time and memory are measured on different imports, tracemalloc
+            # slows down the import several times
+            elapsed, _ = run_import(path, chunk_size, trace=False)
+            _, peak = run_import(path, chunk_size, trace=True)
+            print(f'{chunk_size:>6} {elapsed:>8.2f} {rows / elapsed:>10.0f} {peak / 1e6:>8.1f}')
+
+
+def run_import(path, chunk_size, trace):
+    user = User(username=f'bench{chunk_size}{trace}', name='Bench', password='x')
+    db.session.add(user)
+    db.session.commit()
+    user_id = user.id
+
+    if trace:
+        tracemalloc.start()
+    start = time.perf_counter()
+    with open(path, 'rb') as stream:
+        import_statement(user_id, stream, 'csv', chunk_size)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1] if trace else 0
+    tracemalloc.stop()
+
+    return elapsed, peak
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,37 @@
+# Logins per second per core (one check_password_hash per login) for each
+# candidate value of PASSWORD_HASH_METHOD
+# Usage: python benchmarks/bench_password_hashing.py [method ...]
+import sys
+import time
+from werkzeug.security import generate_password_hash, check_password_hash
+
+METHODS = [
+    'scrypt',                   # werkzeug default (scrypt:32768:8:1)
+    'scrypt:16384:8:1',
+    'pbkdf2:sha256',            # werkzeug default for pbkdf2 (1000000 iterations)
+    'pbkdf2:sha256:600000',
+    'pbkdf2:sha256:260000',
+]
+SECONDS = 2
+
+
+def logins_per_second(method):
+    stored = generate_password_hash('correct horse battery staple', method=method)
+    checks = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < SECONDS:
+        check_password_hash(stored, 'correct horse battery staple')
+        checks += 1
+    return checks / (time.perf_counter() - start), stored.split('$', 1)[0]
+
+
+def main():
+    methods = sys.argv[1:] or METHODS
+    print(f"{'method':<24} {'stored as':<24} {'logins/s/core':>14} {'ms/login':>10}")
+    for method in methods:
+        rate, parameters = logins_per_second(method)
+        print(f'{method:<24} {parameters:<24} {rate:>14.1f} {1000 / rate:>10.1f}')
+
+
+if __name__ == '__main__':
+    main()
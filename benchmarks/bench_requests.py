@@ -0,0 +1,315 @@
+# Throughput and latency (p50/p99) of the main user actions: login, dashboard,
+# add, edit and delete a transaction. Runs them against a generated database
+# (generate_data.py) through the Flask test client (the cost of the app alone)
+# and through gunicorn started locally (HTTP, several workers and clients).
+# Writes a JSON report, with --baseline the results are compared with a
+# report of other commit
+# Usage: python benchmarks/bench_requests.py [--users 20] [--rows 500] [--requests 200]
+#        [--concurrency 4] [--workers 2] [--no-gunicorn] [--output report.json] [--baseline old.json]
+import os
+import re
+import sys
+import json
+import time
+import shutil
+import socket
+import argparse
+import platform
+import tempfile
+import threading
+import subprocess
+import statistics
+import urllib.error
+import urllib.parse
+import urllib.request
+from http.cookiejar import CookieJar
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from app import create_app
+from models import db, User, Outcome
+from generate_data import generate, PASSWORD
+
+# Actions measured, in order (delete last, it removes the rows edited before)
+ACTIONS = ['login', 'dashboard', 'add', 'edit', 'delete']
+
+CSRF_TOKEN = re.compile(r'name="csrf_token" type="hidden" value="([^"]+)"')
+
+# Seconds to wait for gunicorn to answer
+STARTUP_TIMEOUT = 30
+
+
+# Session of a user with the test client
+class TestClientSession:
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def get(self, path):
+        response = self.client.get(path)
+        return response.status_code, response.get_data(as_text=True)
+
+    def post(self, path, data):
+        response = self.client.post(path, data=data)
+        return response.status_code, response.get_data(as_text=True)
+
+
+# Session of a user over HTTP (cookies kept, redirects not followed)
+class HttpSession:
+    class NoRedirect(urllib.request.HTTPRedirectHandler):
+        def redirect_request(self, *args):
+            return None
+
+    def __init__(self, base_url):
+        self.base_url = base_url
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(CookieJar()), self.NoRedirect())
+
+    def get(self, path):
+        return self.open(urllib.request.Request(self.base_url + path))
+
+    def post(self, path, data):
+        return self.open(urllib.request.Request(self.base_url + path, data=urllib.parse.urlencode(data).encode()))
+
+    def open(self, request):
+        try:
+            with self.opener.open(request) as response:
+                return response.status, response.read().decode()
+        except urllib.error.HTTPError as error:
+            return error.code, error.read().decode()
+
+
+# Logs the user in and returns the CSRF token of the session (read from the
+# forms of the pages)
+def login(session, username):
+    _, page = session.get('/')
+    token = csrf_token(page)
+    session.post('/', {'username': username, 'password': PASSWORD, 'csrf_token': token})
+    return token
+
+
+def csrf_token(page):
+    match = CSRF_TOKEN.search(page)
+    return match.group(1) if match else ''
+
+
+# Requests of one action sent by one user: the user logs in (not measured),
+# waits for the other users and sends `count` requests one after the other.
+# Returns the (seconds, ok) of every request and when they started and ended
+def run_action(action, session, username, ids, count, barrier):
+    token = login(session, username)
+    if action in ('edit', 'delete'):
+        count = min(count, len(ids))
+    timings = []
+
+    barrier.wait()
+    started = time.perf_counter()
+    for i in range(count):
+        start = time.perf_counter()
+        if action == 'login':
+            # The form of the home page logs the user in again on every post
+            status, _ = session.post('/', {'username': username, 'password': PASSWORD, 'csrf_token': token})
+            ok = status == 302
+        elif action == 'dashboard':
+            status, _ = session.get(f'/{username}')
+            ok = status == 200
+        elif action == 'add':
+            data = {'amount': '12.5', 'type': 'Food', 'description': f'bench {i}', 'csrf_token': token}
+            status, _ = session.post(f'/{username}', data)
+            ok = status == 302
+        elif action == 'edit':
+            data = {'amount': '20', 'type': 'Transport', 'description': f'edit {i}', 'csrf_token': token}
+            status, _ = session.post(f'/edit_income/{ids[i]}/outcome', data)
+            ok = status == 302
+        else:
+            status, _ = session.get(f'/delete_outcome/{ids[i]}/outcome')
+            ok = status == 302
+        timings.append((time.perf_counter() - start, ok))
+
+    return timings, started, time.perf_counter()
+
+
+# Runs every action with all the users at the same time, each user sends its
+# share of the requests
+def run_target(new_session, users, requests):
+    results = {}
+    per_user = max(1, requests // len(users))
+
+    for action in ACTIONS:
+        barrier = threading.Barrier(len(users))
+        with ThreadPoolExecutor(len(users)) as executor:
+            futures = [
+                executor.submit(run_action, action, new_session(), username, ids, per_user, barrier)
+                for username, ids in users
+            ]
+            runs = [future.result() for future in futures]
+
+        timings = [timing for run, _, _ in runs for timing in run]
+        elapsed = max(end for _, _, end in runs) - min(start for _, start, _ in runs)
+        results[action] = summarize(timings, elapsed)
+        print(f"  {action:>10} {results[action]['throughput']:>10.1f} req/s "
+              f"p50 {results[action]['p50_ms']:>8.2f} ms  p99 {results[action]['p99_ms']:>8.2f} ms"
+              f"{'  errors ' + str(results[action]['errors']) if results[action]['errors'] else ''}")
+    return results
+
+
+def summarize(timings, elapsed):
+    seconds = sorted(seconds for seconds, _ in timings)
+    return {
+        'requests': len(timings),
+        'errors': sum(1 for _, ok in timings if not ok),
+        'seconds': round(elapsed, 4),
+        'throughput': round(len(timings) / elapsed, 2),
+        'mean_ms': round(statistics.mean(seconds) * 1000, 3),
+        'p50_ms': round(percentile(seconds, 50) * 1000, 3),
+        'p99_ms': round(percentile(seconds, 99) * 1000, 3),
+    }
+
+
+# Nearest rank percentile of sorted values
+def percentile(values, rank):
+    return values[max(0, min(len(values) - 1, -(-len(values) * rank // 100) - 1))]
+
+
+# Users of the generated database with the outcomes they can edit and delete
+def bench_users(count, requests):
+    users = []
+    for user in db.session.scalars(db.select(User).order_by(User.id).limit(count)):
+        ids = db.session.scalars(
+            db.select(Outcome.id).where(Outcome.user_id == user.id).order_by(Outcome.id).limit(requests)
+        ).all()
+        users.append((user.username, ids))
+    return users
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+# gunicorn with the configuration of the repo (gunicorn.conf.py) on a free port
+def start_gunicorn(config_name, database, workers):
+    port = free_port()
+    env = dict(os.environ, DATABASE_URL=f'sqlite:///{database}', PORT=str(port), WEB_CONCURRENCY=str(workers))
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', f'app:create_app("{config_name}")'],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+
+    base_url = f'http://127.0.0.1:{port}'
+    deadline = time.perf_counter() + STARTUP_TIMEOUT
+    while time.perf_counter() < deadline:
+        if process.poll() is not None:
+            sys.exit(f'gunicorn exited with code {process.returncode}')
+        try:
+            urllib.request.urlopen(base_url + '/').close()
+            return process, base_url
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    sys.exit('gunicorn did not start')
+
+
+def git_commit():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=ROOT,
+                                    capture_output=True, text=True, check=True).stdout.strip())
+        return commit, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+
+
+# Change of every action against the report of other commit
+def compare(report, baseline):
+    print(f"\ncompared with {baseline.get('commit') or 'baseline'}")
+    print(f"{'target':>12} {'action':>10} {'throughput':>12} {'p50':>10} {'p99':>10}")
+    for target, results in report['results'].items():
+        for action, result in results.items():
+            previous = baseline.get('results', {}).get(target, {}).get(action)
+            if previous:
+                print(f"{target:>12} {action:>10} {change(result['throughput'], previous['throughput']):>12} "
+                      f"{change(result['p50_ms'], previous['p50_ms']):>10} {change(result['p99_ms'], previous['p99_ms']):>10}")
+
+
+def change(value, previous):
+    return f'{(value - previous) / previous * 100:+.1f}%' if previous else 'n/a'
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark of the main requests of the app.')
+    parser.add_argument('--users', type=int, default=20, help='users of the generated database')
+    parser.add_argument('--rows', type=int, default=500, help='transactions per user (on average)')
+    parser.add_argument('--months', type=int, default=24, help='months of history')
+    parser.add_argument('--requests', type=int, default=200, help='requests per action')
+    parser.add_argument('--concurrency', type=int, default=4, help='users sending requests at the same time to gunicorn')
+    parser.add_argument('--workers', type=int, default=2, help='gunicorn workers')
+    parser.add_argument('--config', default='config.ProductionConfig', help='configuration of the app')
+    parser.add_argument('--no-gunicorn', action='store_true', help='only run the test client')
+    parser.add_argument('--output', help='path of the JSON report (bench-requests-<commit>.json by default)')
+    parser.add_argument('--baseline', help='JSON report to compare with')
+    args = parser.parse_args()
+
+    commit, dirty = git_commit()
+    folder = tempfile.mkdtemp()
+    generated = os.path.join(folder, 'generated.db')
+
+    # Every target starts from a copy of the same database
+    app = create_app(args.config, SQLALCHEMY_DATABASE_URI=f'sqlite:///{generated}')
+    start = time.perf_counter()
+    with app.app_context():
+        db.create_all()
+        generate(args.users, args.rows, args.months)
+        users = bench_users(max(1, args.concurrency), args.requests)
+        # Closing every connection writes the WAL to the file before the copies
+        db.session.remove()
+        db.engine.dispose()
+    print(f'{args.users} users, ~{args.rows} rows each generated in {time.perf_counter() - start:.1f} s')
+
+    report = {
+        'commit': commit,
+        'dirty': dirty,
+        'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'password_hash_method': app.config['PASSWORD_HASH_METHOD'],
+        'params': {key: value for key, value in vars(args).items() if key not in ('output', 'baseline')},
+        'results': {},
+    }
+
+    try:
+        # The test client runs in this process, one user at a time
+        database = os.path.join(folder, 'test_client.db')
+        shutil.copy(generated, database)
+        app = create_app(args.config, SQLALCHEMY_DATABASE_URI=f'sqlite:///{database}')
+        print('test client')
+        report['results']['test_client'] = run_target(lambda: TestClientSession(app), users[:1], args.requests)
+
+        if not args.no_gunicorn:
+            database = os.path.join(folder, 'gunicorn.db')
+            shutil.copy(generated, database)
+            process, base_url = start_gunicorn(args.config, database, args.workers)
+            try:
+                print(f'gunicorn ({args.workers} workers, {len(users)} clients)')
+                report['results']['gunicorn'] = run_target(lambda: HttpSession(base_url), users, args.requests)
+            finally:
+                process.terminate()
+                process.wait()
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+    output = args.output or f"bench-requests-{(commit or 'unknown')[:8]}.json"
+    with open(output, 'w') as report_file:
+        json.dump(report, report_file, indent=2)
+    print(f'report written to {output}')
+
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            compare(report, json.load(baseline_file))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+# Throughput of N writer and M reader processes (like gunicorn workers) sharing
+# one SQLite file, with the default settings vs the ProductionConfig profile
+# Usage: python benchmarks/bench_sqlite_concurrency.py [writers] [readers] [seconds]
+import os
+import sys
+import time
+import tempfile
+import multiprocessing
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy.exc import OperationalError
+from app import create_app
+from config import Config, ProductionConfig
+from models import db, User, Income
+from queries import get_totals, bump_data_version
+
+USERS = 10
+
+
+def worker(config, uri, role, seconds, index, results):
+    app = create_app(config, SQLALCHEMY_DATABASE_URI=uri)
+    operations = errors = 0
+
+    with app.app_context():
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline:
+            user_id = (operations + index) % USERS + 1
+            try:
+                if role == 'writer':
+                    db.session.add(Income(user_id=user_id, amount=10, type='Salary', description='bench'))
+                    bump_data_version(user_id)
+                    db.session.commit()
+                else:
+                    db.session.get(User, user_id)
+                    get_totals(user_id)
+                    db.session.rollback()
+                operations += 1
+            except OperationalError:  # database is locked
+                db.session.rollback()
+                errors += 1
+
+    results.put((role, operations, errors))
+
+
+def run(name, config, writers, readers, seconds):
+    folder = tempfile.mkdtemp()
+    uri = f'sqlite:///{os.path.join(folder, "bench.db")}'
+
+    app = create_app(config, SQLALCHEMY_DATABASE_URI=uri)
+    with app.app_context():
+        db.create_all()
+        db.session.add_all([User(username=f'user{i}', name='Bench', password='x') for i in range(USERS)])
+        db.session.commit()
+        db.engine.dispose()
+
+    results = multiprocessing.Queue()
+    processes = [
+        multiprocessing.Process(target=worker, args=(config, uri, role, seconds, i, results))
+        for i, role in enumerate(['writer'] * writers + ['reader'] * readers)
+    ]
+    for process in processes:
+        process.start()
+    totals = {'writer': [0, 0], 'reader': [0, 0]}
+    for _ in processes:
+        role, operations, errors = results.get()
+        totals[role][0] += operations
+        totals[role][1] += errors
+    for process in processes:
+        process.join()
+
+    print(f"{name:>12} {totals['writer'][0] / seconds:>12.0f} {totals['reader'][0] / seconds:>12.0f} "
+          f"{totals['writer'][1] + totals['reader'][1]:>8}")
+
+
+def main():
+    writers = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    readers = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    seconds = float(sys.argv[3]) if len(sys.argv) > 3 else 5
+
+    print(f'{writers} writers, {readers} readers, {seconds:.0f} s')
+    print(f"{'profile':>12} {'writes/s':>12} {'reads/s':>12} {'errors':>8}")
+    run('default', Config, writers, readers, seconds)
+    run('production', ProductionConfig, writers, readers, seconds)
+
+
+if __name__ == '__main__':
+    main()
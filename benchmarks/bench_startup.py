@@ -0,0 +1,48 @@
+# Startup time of a worker: `import app` must stay under a time budget and must
+# not load the plotting stack (it is imported on the first rendered plot)
+# Usage: python benchmarks/bench_startup.py [budget in seconds]
+import os
+import sys
+import subprocess
+import statistics
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RUNS = 5
+DEFAULT_BUDGET = 1.0  # Seconds
+HEAVY_MODULES = ['matplotlib', 'seaborn', 'pandas', 'numpy']
+
+CHILD = f'''
+import sys, time
+start = time.perf_counter()
+import app
+print(time.perf_counter() - start)
+print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))
+'''
+
+
+def measure():
+    output = subprocess.run(
+        [sys.executable, '-c', CHILD],
+        cwd=ROOT, capture_output=True, text=True, check=True
+    ).stdout.splitlines()
+    return float(output[0]), output[1]
+
+
+def main():
+    budget = float(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_BUDGET
+    results = [measure() for _ in range(RUNS)]
+    times = [elapsed for elapsed, _ in results]
+    loaded = results[0][1]
+
+    print(f'import app: median {statistics.median(times) * 1000:.1f} ms, '
+          f'max {max(times) * 1000:.1f} ms (budget {budget * 1000:.0f} ms)')
+
+    if loaded:
+        sys.exit(f'FAIL: heavy modules loaded at import time: {loaded}')
+    if statistics.median(times) > budget:
+        sys.exit('FAIL: import app is over the startup budget')
+    print('OK')
+
+
+if __name__ == '__main__':
+    main()
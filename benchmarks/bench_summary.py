@@ -0,0 +1,108 @@
+# Benchmark of the dashboard totals: loading every row vs SUM / GROUP BY vs
+# the running totals of the user
+# Usage: python benchmarks/bench_summary.py
+import os
+import sys
+import random
+import timeit
+from datetime import date, timedelta
+from sqlalchemy import func, literal, type_coerce, union_all
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from config import TestingConfig
+from models import db, User, Income, Outcome
+from queries import get_totals
+
+INCOME_TYPES = ['Salary', 'Investment', 'Bonus', 'Other']
+OUTCOME_TYPES = ['Food', 'Transport', 'Health', 'Education', 'Entertainment', 'Other']
+HISTORY_SIZES = [100, 1000, 10000, 50000]
+
+
+def seed(user_id, rows):
+    start = date(2015, 1, 1)
+    db.session.execute(db.insert(Income), [
+        {'user_id': user_id, 'amount': random.uniform(100, 5000),
+         'type': random.choice(INCOME_TYPES), 'description': 'bench',
+         'date': start + timedelta(days=random.randint(0, 3650))}
+        for _ in range(rows // 2)
+    ])
+    db.session.execute(db.insert(Outcome), [
+        {'user_id': user_id, 'amount': random.uniform(1, 500),
+         'type': random.choice(OUTCOME_TYPES), 'description': 'bench',
+         'date': start + timedelta(days=random.randint(0, 3650))}
+        for _ in range(rows // 2)
+    ])
+    db.session.commit()
+
+
+# Previous implementation of the dashboard, kept here as the baseline
+def load_all(user_id):
+    incomes = Income.query.filter_by(user_id=user_id).all()
+    outcomes = Outcome.query.filter_by(user_id=user_id).all()
+    return sum([income.amount for income in incomes]), sum([outcome.amount for outcome in outcomes])
+
+
+# Implementation of the dashboard before the running totals: the summary is
+# computed by the database (SUM / GROUP BY) on every request
+def get_summary(user_id):
+
+    incomes = (
+        db.select(
+            literal('income').label('kind'),
+            type_coerce(Income.type, db.String).label('type'),
+            func.sum(Income.amount).label('total')
+        )
+        .where(Income.user_id == user_id)
+        .group_by(Income.type)
+    )
+
+    outcomes = (
+        db.select(
+            literal('outcome').label('kind'),
+            type_coerce(Outcome.type, db.String).label('type'),
+            func.sum(Outcome.amount).label('total')
+        )
+        .where(Outcome.user_id == user_id)
+        .group_by(Outcome.type)
+    )
+
+    summary = {
+        'total_income': 0.0,
+        'total_outcome': 0.0,
+        'incomes': {},
+        'outcomes': {}
+    }
+
+    # Both aggregates are resolved in a single round trip, the type column is
+    # read as a plain string because each model defines a different Enum
+    for kind, transaction_type, total in db.session.execute(union_all(incomes, outcomes)):
+        summary[kind + 's'][transaction_type] = total
+        summary['total_' + kind] += total
+
+    return summary
+
+
+def main():
+    app = create_app(TestingConfig)
+    with app.app_context():
+        db.create_all()
+
+        print(f"{'rows':>8} {'load all (ms)':>15} {'summary (ms)':>15} {'totals (ms)':>15}")
+        for i, rows in enumerate(HISTORY_SIZES):
+            user = User(username=f'bench{i}', name='Bench', password='x')
+            db.session.add(user)
+            db.session.commit()
+            seed(user.id, rows)
+
+            number = 5
+            baseline = timeit.timeit(lambda: (load_all(user.id), db.session.expunge_all()), number=number)
+            summary = timeit.timeit(lambda: get_summary(user.id), number=number)
+            totals = timeit.timeit(lambda: get_totals(user.id), number=number)
+            print(f'{rows:>8} {baseline / number * 1000:>15.2f} {summary / number * 1000:>15.2f} '
+                  f'{totals / number * 1000:>15.2f}')
+
+
+if __name__ == '__main__':
+    main()
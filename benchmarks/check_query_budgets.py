@@ -0,0 +1,117 @@
+# Goes through the routes of the app with a user with a long history and big
+# batches and fails if a request goes over the query budget of its view or
+# repeats a statement per row (see query_budget.py)
+# Usage: python benchmarks/check_query_budgets.py
+import io
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import g, request
+from app import create_app
+from config import TestingConfig
+from models import db, Income, Outcome
+from query_budget import QueryBudgetExceeded, view_budget
+from generate_data import generate, PASSWORD
+
+# Transactions of the user and items of the batches of the JSON API, enough for
+# a statement per row to stand out
+ROWS = 300
+BATCH_SIZE = 50
+
+
+# Fields changed by the items of the mixed PATCH, every set of fields is a
+# different UPDATE
+PATCH_FIELDS = [
+    {'description': 'edited'},
+    {'amount': 7},
+    {'type': 'Other', 'date': '2024-02-01'},
+    {'amount': 3, 'type': 'Other', 'description': 'edited', 'date': '2024-03-01'},
+    {'date': '2024-04-01'},
+]
+
+
+# Requests of a user going through the routes, sent one by one by main
+def route_requests(client, outcome_ids, income_ids):
+    batch = [{'kind': 'outcome', 'type': 'Food', 'amount': 5, 'description': f'row {i}'} for i in range(BATCH_SIZE)]
+    mixed_batch = [{'kind': 'income', 'type': 'Bonus', 'amount': 50, 'description': f'row {i}', 'date': '2024-01-15'}
+                   if i % 2 else item for i, item in enumerate(batch)]
+    mixed_patch = [
+        {'kind': kind, 'id': id, **PATCH_FIELDS[i % len(PATCH_FIELDS)]}
+        for i, (kind, id) in enumerate([('outcome', id) for id in outcome_ids[BATCH_SIZE:2 * BATCH_SIZE]] +
+                                       [('income', id) for id in income_ids[:10]])
+    ]
+    mixed_delete = ([{'kind': 'outcome', 'id': id} for id in outcome_ids[2 * BATCH_SIZE:3 * BATCH_SIZE]] +
+                    [{'kind': 'income', 'id': id} for id in income_ids[10:20]])
+    statement = 'date,amount,description\n' + ''.join(f'2024-01-{i % 28 + 1:02d},-{i},row {i}\n' for i in range(BATCH_SIZE))
+
+    return [
+        lambda: client.get('/'),
+        lambda: client.post('/', data={'username': 'user0', 'password': PASSWORD}),
+        lambda: client.get('/user0'),
+        lambda: client.get('/user0?month=2025-01'),
+        lambda: client.post('/user0', data={'amount': '1000', 'type': 'Salary', 'description': 'Salary'}),
+        lambda: client.post('/user0', data={'amount': '50', 'type': 'Food', 'description': 'Food'}),
+        lambda: client.get('/plot/user0?chart=income_outcome'),
+        lambda: client.get('/plot/user0?chart=outcome_by_type'),
+        lambda: client.get('/plot/user0?chart=monthly_trend'),
+        lambda: client.get('/history/user0'),
+        lambda: client.get('/export/user0'),
+        lambda: client.post('/import/user0', data={'file': (io.BytesIO(statement.encode()), 'statement.csv')}),
+        lambda: client.get('/api/v1/transactions'),
+        lambda: client.get('/api/v1/analytics'),
+        lambda: client.get('/api/v1/charts'),
+        lambda: client.post('/api/v1/transactions', json=batch),
+        lambda: client.patch('/api/v1/transactions', json=[{'kind': 'outcome', 'id': id, 'amount': 7} for id in outcome_ids[:BATCH_SIZE]]),
+        lambda: client.delete('/api/v1/transactions', json=[{'kind': 'outcome', 'id': id} for id in outcome_ids[:BATCH_SIZE]]),
+        lambda: client.post('/api/v1/transactions', json=mixed_batch),
+        lambda: client.patch('/api/v1/transactions', json=mixed_patch),
+        lambda: client.delete('/api/v1/transactions', json=mixed_delete),
+        lambda: client.get(f'/edit_income/{outcome_ids[-1]}/outcome'),
+        lambda: client.post(f'/edit_income/{outcome_ids[-1]}/outcome', data={'amount': '60', 'type': 'Food', 'description': 'Food'}),
+        lambda: client.get(f'/delete_outcome/{outcome_ids[-2]}/outcome'),
+        lambda: client.get('/edit/user0'),
+        lambda: client.post('/edit/user0', data={'username': 'user0', 'name': 'User'}),
+        lambda: client.get('/logout'),
+        lambda: client.post('/register', data={'username': 'ana', 'name': 'Ana', 'password': 'pw', 'confirm_password': 'pw'}),
+        lambda: client.post('/', data={'username': 'user0', 'password': PASSWORD}),
+        lambda: client.get('/delete/user0'),
+        lambda: client.post('/delete/user0', data={'action': 'delete'}),
+    ]
+
+
+def main():
+    app = create_app(TestingConfig)
+
+    # Statements of every request, read before the check of query_budget.py
+    # (the hooks added later run first)
+    @app.after_request
+    def report(response):
+        limit, _ = view_budget()
+        print(f"{len(g.get('query_log') or []):>4} / {limit if limit is not None else '-':>4}  "
+              f'{request.method:<6} {request.full_path.rstrip("?")}')
+        return response
+
+    with app.app_context():
+        db.create_all()
+        generate(1, ROWS)
+        outcome_ids = db.session.scalars(db.select(Outcome.id).order_by(Outcome.id)).all()
+        income_ids = db.session.scalars(db.select(Income.id).order_by(Income.id)).all()
+
+    print('stmts / budget')
+    failures = 0
+    for send in route_requests(app.test_client(), outcome_ids, income_ids):
+        try:
+            send()
+        except QueryBudgetExceeded as error:
+            failures += 1
+            print('    FAIL', error)
+
+    print(f'{failures} requests over their query budget')
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
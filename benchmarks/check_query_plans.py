@@ -0,0 +1,80 @@
+# Runs EXPLAIN QUERY PLAN on every statement the app issues while going through
+# its routes and fails if any of them falls back to a full scan of a table
+# Usage: python benchmarks/check_query_plans.py
+import os
+import re
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask_migrate import upgrade
+from sqlalchemy import event
+from app import create_app
+from config import TestingConfig
+from models import db
+
+# "SCAN income" or "SCAN income USING COVERING INDEX ..." (reads the whole table
+# or index), compared with "SEARCH income USING INDEX ..." (reads a range)
+FULL_SCAN = re.compile(r'^SCAN (user|income|outcome)\b')
+
+# Write statements are checked too, only the inserts (no lookup) are skipped
+CHECKED = ('SELECT', 'UPDATE', 'DELETE')
+
+
+# Goes through the routes of the app as a user would
+def exercise_routes(client):
+    client.post('/register', data={'username': 'ana', 'name': 'Ana', 'password': 'pw', 'confirm_password': 'pw'})
+    client.post('/', data={'username': 'ana', 'password': 'pw'})
+    client.post('/ana', data={'amount': '1000', 'type': 'Salary', 'description': 'Salary'})
+    client.post('/ana', data={'amount': '50', 'type': 'Food', 'description': 'Food'})
+    client.post('/ana', data={'amount': '20', 'type': 'Transport', 'description': 'Bus'})
+    client.get('/ana')
+    client.get('/plot/ana')
+    client.get('/api/v1/charts')
+    client.get('/history/ana?limit=1')
+    client.get('/api/v1/transactions?limit=1&cursor=2024-05-31_income_1')
+    client.get('/api/v1/transactions?limit=1&cursor=2024-05-31_outcome_1')
+    client.get('/edit_income/1/income')
+    client.post('/edit_income/1/income', data={'amount': '1100', 'type': 'Salary', 'description': 'Salary'})
+    client.post('/edit_income/1/outcome', data={'amount': '60', 'type': 'Food', 'description': 'Food'})
+    client.get('/delete_outcome/2/outcome')
+    client.get('/delete_income/1')
+    client.post('/edit/ana', data={'username': 'ana', 'name': 'Ana Maria'})
+    client.post('/delete/ana', data={'action': 'delete'})
+
+
+def main():
+    app = create_app(TestingConfig)
+    statements = {}
+
+    with app.app_context():
+        upgrade()
+
+        # Recording every statement (with its first parameters) sent to the database
+        def record(conn, cursor, statement, parameters, context, executemany):
+            if statement.lstrip().upper().startswith(CHECKED) and not executemany:
+                statements.setdefault(statement, parameters)
+
+        event.listen(db.engine, 'before_cursor_execute', record)
+        exercise_routes(app.test_client())
+        event.remove(db.engine, 'before_cursor_execute', record)
+
+        failures = 0
+        with db.engine.connect() as connection:
+            for statement, parameters in statements.items():
+                plan = connection.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters).all()
+                details = [row[-1] for row in plan]
+                scans = [detail for detail in details if FULL_SCAN.match(detail)]
+                failures += bool(scans)
+
+                print('FULL SCAN' if scans else 'OK', ' '.join(statement.split()))
+                for detail in details:
+                    print('    ', detail)
+
+    print(f'{len(statements)} statements checked, {failures} with full scans')
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+# Synthetic database like fhData.db: users with a salary every month, some
+# investments and bonuses, and expenses spread over the days of the period with
+# the amounts and frequencies of each category. The running totals and the
+# monthly rollup are rebuilt from the rows, as after `flask reconcile-balances`
+# Usage: python benchmarks/generate_data.py <database file> [--users 100] [--rows 500] [--months 24]
+import os
+import sys
+import math
+import random
+import argparse
+from datetime import date, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from werkzeug.security import generate_password_hash
+from flask import current_app
+from flask_migrate import stamp
+from app import create_app
+from config import ProductionConfig
+from models import db, User, Income, Outcome
+from balances import reconcile_balances, rebuild_rollups
+
+# Password of every generated user (user0, user1...)
+PASSWORD = 'bench'
+
+# Category -> (weight, median amount) of the expenses
+OUTCOME_CATEGORIES = {
+    'Food': (40, 25),
+    'Transport': (20, 12),
+    'Entertainment': (15, 40),
+    'Health': (10, 60),
+    'Other': (10, 30),
+    'Education': (5, 150),
+}
+SALARY_RANGE = (1500, 6000)
+
+# Rows inserted per executemany
+CHUNK_SIZE = 10000
+
+
+# Rows of a user: ~rows transactions (heavier and lighter users around it) in
+# the last `months` months
+def user_rows(rng, user_id, rows, months, today):
+    first = (today.replace(day=1) - timedelta(days=30 * (months - 1))).replace(day=1)
+    salary = rng.uniform(*SALARY_RANGE)
+
+    incomes = []
+    month = first
+    while month <= today:
+        incomes.append(('Salary', round(salary * rng.uniform(0.98, 1.02), 2), month, 'Salario'))
+        if month.month % 3 == 0 and rng.random() < 0.6:
+            incomes.append(('Investment', round(rng.lognormvariate(math.log(200), 0.8), 2), month + timedelta(days=14), 'Dividendos'))
+        if month.month in (6, 12):
+            incomes.append(('Bonus', round(salary * rng.uniform(0.3, 1.0), 2), month + timedelta(days=19), 'Prima'))
+        if rng.random() < 0.1:
+            incomes.append(('Other', round(rng.uniform(20, 300), 2), month + timedelta(days=rng.randint(0, 27)), 'Venta'))
+        month = (month + timedelta(days=32)).replace(day=1)
+    incomes = [income for income in incomes if income[2] <= today]
+
+    categories = list(OUTCOME_CATEGORIES)
+    weights = [weight for weight, _ in OUTCOME_CATEGORIES.values()]
+    days = (today - first).days
+    count = max(0, int(rows * rng.lognormvariate(0, 0.5)) - len(incomes))
+    outcomes = []
+    for category in rng.choices(categories, weights, k=count):
+        median = OUTCOME_CATEGORIES[category][1]
+        amount = round(rng.lognormvariate(math.log(median), 0.6), 2)
+        outcomes.append((category, amount, first + timedelta(days=rng.randint(0, days)), category.lower()))
+
+    return (
+        [{'user_id': user_id, 'type': t, 'amount': a, 'date': d, 'description': s} for t, a, d, s in incomes],
+        [{'user_id': user_id, 'type': t, 'amount': a, 'date': d, 'description': s} for t, a, d, s in outcomes],
+    )
+
+
+# Adds the users and their transactions to the database of the current app
+def generate(users, rows, months=24, seed=0):
+    rng = random.Random(seed)
+    today = date.today()
+
+    # Hashed once with the configured method, the logins never rehash them
+    password = generate_password_hash(PASSWORD, method=current_app.config['PASSWORD_HASH_METHOD'])
+    offset = db.session.scalar(db.select(db.func.count()).select_from(User))
+    db.session.execute(db.insert(User), [
+        {'username': f'user{offset + i}', 'name': f'User {offset + i}', 'password': password}
+        for i in range(users)
+    ])
+    user_ids = db.session.scalars(db.select(User.id).order_by(User.id).offset(offset)).all()
+
+    pending = {Income: [], Outcome: []}
+    for user_id in user_ids:
+        incomes, outcomes = user_rows(rng, user_id, rows, months, today)
+        pending[Income].extend(incomes)
+        pending[Outcome].extend(outcomes)
+        for model, values in pending.items():
+            if len(values) >= CHUNK_SIZE:
+                db.session.execute(db.insert(model), values)
+                values.clear()
+    for model, values in pending.items():
+        if values:
+            db.session.execute(db.insert(model), values)
+    db.session.commit()
+
+    # The rows were inserted without the ORM, totals and rollup from the rows
+    reconcile_balances(fix=True)
+    rebuild_rollups()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate a database with synthetic users and transactions.')
+    parser.add_argument('database', help='path of the SQLite file to create')
+    parser.add_argument('--users', type=int, default=100, help='users to generate')
+    parser.add_argument('--rows', type=int, default=500, help='transactions per user (on average)')
+    parser.add_argument('--months', type=int, default=24, help='months of history')
+    args = parser.parse_args()
+    path = os.path.abspath(args.database)
+
+    app = create_app(ProductionConfig, SQLALCHEMY_DATABASE_URI=f'sqlite:///{path}')
+    with app.app_context():
+        db.create_all()
+        # The tables are the ones of the last migration, `flask db upgrade` has
+        # nothing to do on the generated database
+        stamp(directory=os.path.join(ROOT, 'migrations'))
+        generate(args.users, args.rows, args.months)
+        print(f'{path}: {db.session.scalar(db.select(db.func.count()).select_from(User))} users, '
+              f'{db.session.scalar(db.select(db.func.count()).select_from(Income))} incomes, '
+              f'{db.session.scalar(db.select(db.func.count()).select_from(Outcome))} outcomes')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,241 @@
+import os
+import time
+import threading
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+from queries import get_chart_rows
+from rendering import init_worker, render_charts
+from instrumentation import record_timing, record_event
+
+
+# Charts of the dashboard carousel, in order
+CHARTS = ('income_outcome', 'outcome_by_type', 'monthly_trend')
+
+# Months shown by the monthly trend (up to the last month with transactions)
+TREND_MONTHS = 12
+
+# Maximum number of users whose charts are kept in memory by each worker
+PLOT_CACHE_SIZE = 256
+
+# Image sent while the first version of a plot is being rendered
+PLACEHOLDER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static', 'images', 'plot-placeholder.png')
+
+# user_id -> (data_version, value), least recently used first. The series of
+# the charts and their PNGs are cached as bundles: every chart of a version
+# comes from the same query and the PNGs are rendered together
+_series_cache = OrderedDict()
+_plot_cache = OrderedDict()
+_plot_cache_lock = threading.Lock()
+
+# user_id -> (data_version, future) of the plots being rendered by the pool
+_pending = {}
+
+# Processes rendering the plots of this worker, created on the first use (or
+# by gunicorn after the fork, see gunicorn.conf.py)
+_render_pool = None
+_render_pool_pid = None
+
+
+# ETag of a plot of a user, it only changes when the transactions change
+def plot_etag(user_id, data_version, chart):
+    return f'plot-{user_id}-{data_version}-{chart}'
+
+
+# Series of every chart of the user, built from the monthly rollup when the
+# data of the user changed since the cached version
+def get_chart_series(user_id, data_version):
+    cached = get_cached(_series_cache, user_id, data_version)
+    if cached is not None:
+        return cached
+
+    series = chart_series(get_chart_rows(user_id))
+    store_cached(_series_cache, user_id, data_version, series)
+    return series
+
+
+# Returns the PNG of a chart of the user and whether it is the requested
+# version. The charts are only rendered when the data of the user changed since
+# the last rendered version. With workers the rendering is done by the pool,
+# off the request thread: the request waits at most `wait` seconds and then
+# gets the previous version of the chart (or the placeholder) while the new one
+# is finished in the background. Without workers it is rendered in the request
+def get_plot(user_id, data_version, chart, workers=0, wait=None):
+    cached = get_cached(_plot_cache, user_id, data_version)
+    if cached is not None:
+        record_event('plot_cache_requests_total', result='hit')
+        return cached[chart], True
+
+    record_event('plot_cache_requests_total', result='miss')
+    series = get_chart_series(user_id, data_version)
+    start = time.perf_counter()
+
+    if not workers:
+        record_event('plot_renders_total')
+        pngs = render_charts(series)
+        store_cached(_plot_cache, user_id, data_version, pngs)
+        record_timing('render_seconds', time.perf_counter() - start)
+        return pngs[chart], True
+
+    future = submit_render(user_id, data_version, series, workers)
+    try:
+        return future.result(timeout=wait)[chart], True
+    except (TimeoutError, BrokenProcessPool):
+        with _plot_cache_lock:
+            previous = _plot_cache.get(user_id)
+        return (previous[1][chart] if previous else placeholder()), False
+    finally:
+        record_timing('render_seconds', time.perf_counter() - start)
+
+
+# Value of the cache for this version of the data of the user (None if the
+# cached value is from other version)
+def get_cached(cache, user_id, data_version):
+    with _plot_cache_lock:
+        cached = cache.get(user_id)
+        if cached and cached[0] == data_version:
+            cache.move_to_end(user_id)
+            return cached[1]
+    return None
+
+
+def store_cached(cache, user_id, data_version, value):
+    with _plot_cache_lock:
+        _store(cache, user_id, data_version, value)
+
+
+# Same as store_cached, with _plot_cache_lock already held
+def _store(cache, user_id, data_version, value):
+    # A newer version may have been stored while this one was built
+    cached = cache.get(user_id)
+    if cached and cached[0] > data_version:
+        return
+    cache[user_id] = (data_version, value)
+    cache.move_to_end(user_id)
+    while len(cache) > PLOT_CACHE_SIZE:
+        cache.popitem(last=False)
+
+
+# Future of the rendering of a version of the charts, the concurrent requests
+# of the same version share it. The cache, the pending renders and the new
+# submission are checked and updated under the same lock, so a version is
+# never rendered twice by this worker
+def submit_render(user_id, data_version, series, workers):
+    pool = start_render_pool(workers)
+
+    with _plot_cache_lock:
+        # Finished since the request missed the cache
+        cached = _plot_cache.get(user_id)
+        if cached and cached[0] == data_version:
+            future = Future()
+            future.set_result(cached[1])
+            return future
+
+        pending = _pending.get(user_id)
+        if pending and pending[0] == data_version:
+            return pending[1]
+
+        record_event('plot_renders_total')
+        future = pool.submit(render_charts, series)
+        _pending[user_id] = (data_version, future)
+
+    def rendered(future):
+        global _render_pool
+        error = future.exception()
+
+        # The PNGs are in the cache before the render stops being pending, a
+        # request never finds neither of them for this version
+        with _plot_cache_lock:
+            if error is None:
+                _store(_plot_cache, user_id, data_version, future.result())
+            if _pending.get(user_id, (None, None))[1] is future:
+                del _pending[user_id]
+
+        if isinstance(error, BrokenProcessPool):
+            # A process of the pool died, its thread and queues are released and
+            # a new pool is started on the next render (once, every pending
+            # future of the pool fails at the same time). Called from the thread
+            # of the pool, it can not wait for it
+            with _plot_cache_lock:
+                if _render_pool is not pool:
+                    return
+                _render_pool = None
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    future.add_done_callback(rendered)
+    return future
+
+
+# Pool of processes of the current worker. Processes are spawned (never
+# forked from a worker with open connections and threads) and import the
+# plotting libraries as soon as they start
+def start_render_pool(workers):
+    global _render_pool, _render_pool_pid
+
+    with _plot_cache_lock:
+        if _render_pool is None or _render_pool_pid != os.getpid():
+            _render_pool = ProcessPoolExecutor(
+                workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=init_worker
+            )
+            _render_pool_pid = os.getpid()
+            # Starting the processes now instead of on the first plot
+            for _ in range(workers):
+                _render_pool.submit(int)
+        return _render_pool
+
+
+# Series of the dashboard charts from the rows of the monthly rollup, drawn by
+# the browser (static/js/charts.js) or rendered as PNG (rendering.py)
+def chart_series(rows):
+    totals = {'income': 0.0, 'outcome': 0.0}
+    outcome_types = {}
+    months = OrderedDict()
+    for month, kind, transaction_type, total in rows:
+        totals[kind] += total
+        if kind == 'outcome':
+            outcome_types[transaction_type] = outcome_types.get(transaction_type, 0.0) + total
+        months.setdefault(month, {'income': 0.0, 'outcome': 0.0})[kind] += total
+
+    # Every month of the trend is shown, also the ones without transactions
+    trend = []
+    if months:
+        year, month = map(int, next(reversed(months)).split('-'))
+        for index in range(year * 12 + month - TREND_MONTHS, year * 12 + month):
+            key = f'{index // 12}-{index % 12 + 1:02d}'
+            trend.append((key, months.get(key, {'income': 0.0, 'outcome': 0.0})))
+
+    outcome_types = sorted(outcome_types.items(), key=lambda item: item[1], reverse=True)
+
+    # The sums of floats are rounded to cents, the charts show them as they are
+    return {
+        'income_outcome': {
+            'type': 'bar',
+            'title': 'Income vs Outcome',
+            'labels': ['Income', 'Outcome'],
+            'datasets': [{'label': 'Amount ($)', 'data': [round(totals['income'], 2), round(totals['outcome'], 2)], 'color': ['green', 'red']}]
+        },
+        'outcome_by_type': {
+            'type': 'bar',
+            'title': 'Outcome by category',
+            'labels': [transaction_type for transaction_type, _ in outcome_types],
+            'datasets': [{'label': 'Amount ($)', 'data': [round(total, 2) for _, total in outcome_types], 'color': 'red'}]
+        },
+        'monthly_trend': {
+            'type': 'line',
+            'title': 'Monthly trend',
+            'labels': [month for month, _ in trend],
+            'datasets': [
+                {'label': 'Income', 'data': [round(values['income'], 2) for _, values in trend], 'color': 'green'},
+                {'label': 'Outcome', 'data': [round(values['outcome'], 2) for _, values in trend], 'color': 'red'}
+            ]
+        }
+    }
+
+
+def placeholder():
+    with open(PLACEHOLDER_PATH, 'rb') as image:
+        return image.read()
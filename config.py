@@ -0,0 +1,71 @@
+import os
+import tempfile
+
+
+# Default configuration of the app, values can be overridden with environment variables
+class Config:
+    SECRET_KEY = os.environ.get('SECRET_KEY', 'secretKey')
+    SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL', 'sqlite:///fhData.db')
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+    PLOT_MAX_AGE = 86400  # Seconds the browsers can keep a versioned plot
+    # werkzeug method and work factor of the password hashes, for example
+    # 'scrypt:32768:8:1' or 'pbkdf2:sha256:600000' (see benchmarks/bench_password_hashing.py)
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt')
+    USER_CACHE_TTL = 60  # Seconds a worker keeps the identity of a user (0 disables it)
+    PAGE_SIZE = 50  # Transactions per page of the history
+    MAX_PAGE_SIZE = 200
+    MAX_BATCH_SIZE = 1000  # Transactions per request of the JSON API
+    IMPORT_CHUNK_SIZE = 5000  # Rows per executemany of the statement imports
+    EXPORT_CHUNK_SIZE = 1000  # Rows fetched and sent at a time by the exports
+    # Processes of each worker rendering the PNG plots off the request threads
+    # (0 renders them in the request) and seconds a request waits for a new
+    # version before getting the previous one
+    CHART_WORKERS = int(os.environ.get('CHART_WORKERS', 1))
+    CHART_RENDER_WAIT = 1.0
+    # Per request timings (Server-Timing header and histograms per endpoint),
+    # INSTRUMENTATION=0 registers no hook at all
+    INSTRUMENTATION = os.environ.get('INSTRUMENTATION', '1') == '1'
+    # Directory where every worker writes its metrics (/metrics adds them
+    # up), without it each process only sees its own. Set by gunicorn.conf.py
+    METRICS_DIR = os.environ.get('METRICS_DIR')
+    # Token of the X-Admin-Token header of the admin routes (/metrics), they
+    # do not exist without it
+    ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN')
+    # Check of the statements of every request against the budget of its view
+    # (query_budget.py): 'off', 'warn' (logged) or 'raise' (the request fails)
+    QUERY_BUDGET = os.environ.get('QUERY_BUDGET', 'off')
+    # Profiles of the requests sent with the X-Profile header by an admin
+    # (profiling.py), shared by the workers, only the newest PROFILE_KEEP are kept
+    PROFILE_DIR = os.environ.get('PROFILE_DIR', os.path.join(tempfile.gettempdir(), 'fh-profiles'))
+    PROFILE_KEEP = 50
+
+
+# Configuration used by the benchmarks and scripts, in memory database and no CSRF
+class TestingConfig(Config):
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = 'sqlite://'
+    WTF_CSRF_ENABLED = False
+    CHART_WORKERS = 0
+    QUERY_BUDGET = 'raise'
+    PASSWORD_HASH_METHOD = 'pbkdf2:sha256:1000'  # Cheap hashes, the tests log in all the time
+
+
+# Configuration for gunicorn with several workers sharing the SQLite database
+class ProductionConfig(Config):
+    # Applied on every new connection (see database.configure_sqlite)
+    SQLITE_PRAGMAS = {
+        'journal_mode': 'WAL',        # Readers are not blocked by the writer
+        'synchronous': 'NORMAL',      # Safe with WAL, no fsync on every commit
+        'busy_timeout': 5000,         # Milliseconds to wait for a lock instead of failing
+        'cache_size': -32000,         # 32 MB of page cache per connection
+        'mmap_size': 268435456,       # 256 MB of the database file memory mapped
+        'temp_store': 'MEMORY',
+    }
+
+    # Connections are kept open and reused by the requests of a worker
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'pool_size': int(os.environ.get('DB_POOL_SIZE', 5)),
+        'max_overflow': 5,
+        'pool_timeout': 10,
+        'connect_args': {'timeout': 5},
+    }
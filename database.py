@@ -0,0 +1,46 @@
+import click
+from flask.cli import with_appcontext
+from flask_migrate import stamp
+from sqlalchemy import event, inspect
+from models import db
+
+
+# Revision of the schema the app created with db.create_all() before the
+# migrations existed (migrations/versions/c3ce55d39fcc_initial_schema.py)
+INITIAL_REVISION = 'c3ce55d39fcc'
+
+
+# Applies the SQLITE_PRAGMAS of the config to every new connection of the app
+# engine (journal mode, busy timeout, caches...), other databases are left as they are
+def configure_sqlite(app):
+    pragmas = app.config.get('SQLITE_PRAGMAS')
+    if not pragmas:
+        return
+
+    with app.app_context():
+        engine = db.engine
+
+    if engine.dialect.name != 'sqlite':
+        return
+
+    @event.listens_for(engine, 'connect')
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+        cursor.close()
+
+
+# Databases created with db.create_all() have the tables but no alembic_version,
+# `flask db upgrade` would try to create them again. They are stamped with the
+# initial revision so the upgrade only applies the later migrations
+@click.command('stamp-existing-db')
+@with_appcontext
+def stamp_existing_db_command():
+    """Stamp a database created before the migrations with the initial revision."""
+    tables = inspect(db.engine).get_table_names()
+    if 'user' in tables and 'alembic_version' not in tables:
+        stamp(revision=INITIAL_REVISION)
+        click.echo(f'Existing database stamped with {INITIAL_REVISION}')
+    else:
+        click.echo('Nothing to stamp')
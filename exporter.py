@@ -0,0 +1,80 @@
+import io
+import csv
+import json
+import zlib
+import heapq
+from sqlalchemy import literal, type_coerce
+from models import db, Income, Outcome
+
+
+MODELS = {'income': Income, 'outcome': Outcome}
+
+# Same columns the importer reads, an export can be imported again
+COLUMNS = ['date', 'kind', 'type', 'amount', 'description']
+
+# Mimetype and file extension of each export format
+EXPORT_FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'jsonl': ('application/x-ndjson', 'jsonl')
+}
+
+
+# Every transaction of the user sorted by date. Each kind is read with its own
+# cursor in (user_id, date) index order, fetching chunk_size rows at a time,
+# and both cursors are merged while they are read: no sort and no full list
+# of the history is ever built, neither in SQLite nor in Python
+def iter_transactions(user_id, chunk_size):
+    cursors = []
+    for kind, model in MODELS.items():
+        query = (
+            db.select(
+                model.date,
+                literal(kind).label('kind'),
+                model.id,
+                type_coerce(model.type, db.String).label('type'),
+                model.amount,
+                model.description
+            )
+            .where(model.user_id == user_id)
+            .order_by(model.date, model.id)
+            .execution_options(yield_per=chunk_size)
+        )
+        cursors.append(db.session.execute(query))
+
+    # Rows are compared by (date, kind, id), which is unique
+    return heapq.merge(*cursors)
+
+
+# Text of the export in pieces of chunk_size rows, the first piece (CSV
+# header) is produced before any row is read so the download starts at once
+def export_chunks(user_id, file_format, chunk_size):
+    buffer = io.StringIO()
+    if file_format == 'csv':
+        writer = csv.writer(buffer)
+        writer.writerow(COLUMNS)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+    for count, row in enumerate(iter_transactions(user_id, chunk_size), start=1):
+        values = [row.date.isoformat(), row.kind, row.type, row.amount, row.description]
+        if file_format == 'csv':
+            writer.writerow(values)
+        else:
+            buffer.write(json.dumps(dict(zip(COLUMNS, values), id=row.id)) + '\n')
+
+        if count % chunk_size == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+    yield buffer.getvalue()
+
+
+# Gzip compression of the chunks as they are produced, every chunk is flushed
+# so the client receives it right away
+def gzip_chunks(chunks):
+    compressor = zlib.compressobj(wbits=zlib.MAX_WBITS | 16)
+    for chunk in chunks:
+        yield compressor.compress(chunk.encode()) + compressor.flush(zlib.Z_SYNC_FLUSH)
+    yield compressor.flush()
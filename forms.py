@@ -1,6 +1,29 @@
 from flask_wtf import FlaskForm
-from wtforms import StringField, PasswordField, SubmitField, SelectField
-from wtforms.validators import DataRequired, EqualTo
+from flask_wtf.file import FileField, FileRequired, FileAllowed
+import math
+from wtforms import StringField, PasswordField, SubmitField, SelectField, FloatField
+from wtforms.validators import DataRequired, InputRequired, EqualTo, ValidationError
+
+# Global variables
+income_choices = [('Salary', 'Salary'), 
+                  ('Investment', 'Investment'),
+                  ('Bonus', 'Bonus'), 
+                  ('Other', 'Other')]
+
+outcome_choices = [('Food', 'Food'),
+                   ('Transport', 'Transport'), 
+                   ('Health', 'Health'), 
+                   ('Education', 'Education'), 
+                   ('Entertainment', 'Entertainment'),
+                   ('Other', 'Other')]
+
+# Routes of a single segment, /<username> (the dashboard of the user) never
+# matches them
+RESERVED_USERNAMES = {'register', 'logout', 'metrics'}
+
+def not_reserved(form, field):
+    if field.data in RESERVED_USERNAMES:
+        raise ValidationError('Username not available.')
 
 class LoginForm(FlaskForm):
     username = StringField('Username', validators=[DataRequired()])
@@ -8,14 +31,14 @@ class LoginForm(FlaskForm):
     submit = SubmitField('Login')
 
 class RegisterForm(FlaskForm):
-    username = StringField('Username', validators=[DataRequired()])
+    username = StringField('Username', validators=[DataRequired(), not_reserved])
     name = StringField('Name', validators=[DataRequired()])
     password = PasswordField('Password', validators=[DataRequired()])
     confirm_password = PasswordField('Confirm Password', validators=[DataRequired(), EqualTo('password', message='Passwords must match')])
     
 
 class EditUserForm(FlaskForm):
-    username = StringField('Username', validators=[DataRequired()])
+    username = StringField('Username', validators=[DataRequired(), not_reserved])
     name = StringField('Name', validators=[DataRequired()])
     update = SubmitField('Update')
 
@@ -23,8 +46,17 @@ class DeleteUserForm(FlaskForm):
     delete = SubmitField('Delete')
     cancel = SubmitField('Cancel')
 
+# FloatField accepts 'nan' and 'inf', the running totals could not add them
+def finite_number(form, field):
+    if field.data is not None and not math.isfinite(field.data):
+        raise ValidationError('Not a valid float value.')
+
 class TransactionForm(FlaskForm):
-    amount = StringField('Amount', validators=[DataRequired()])
+    amount = FloatField('Amount', validators=[InputRequired(), finite_number])
     type = SelectField('Type', validators=[DataRequired()])
     description = StringField('Description', validators=[DataRequired()])
-    submit = SubmitField('Add') 
\ No newline at end of file
+    submit = SubmitField('Add')
+
+class ImportForm(FlaskForm):
+    file = FileField('File', validators=[FileRequired(), FileAllowed(['csv', 'ofx', 'qfx'], 'Only CSV or OFX files')])
+    submit = SubmitField('Import')
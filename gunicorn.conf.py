@@ -0,0 +1,38 @@
+# Gunicorn configuration, loaded automatically by `gunicorn 'app:create_app()'`
+import os
+import tempfile
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+workers = int(os.environ.get('WEB_CONCURRENCY', 2))
+# Threads per worker (gthread workers when more than 1), every thread renders
+# the plots on its own Figure (see rendering.py)
+threads = int(os.environ.get('WEB_THREADS', 1))
+
+# The app is created once in the master and the workers are forked from it
+preload_app = True
+
+# The workers write their metrics to files of this directory, /metrics
+# adds up the files of every worker (must be set before the app is loaded)
+os.environ.setdefault('METRICS_DIR', os.path.join(tempfile.gettempdir(), f"fh-metrics-{bind.rsplit(':', 1)[1]}"))
+
+
+# Runs in the master before anything else, the metrics of a previous run are removed
+def on_starting(server):
+    from metrics import clear_metrics
+    if os.path.isdir(os.environ['METRICS_DIR']):
+        clear_metrics(os.environ['METRICS_DIR'])
+
+
+# Runs in the master before the workers are forked
+def when_ready(server):
+    from app import warm_up
+    warm_up(server.app.wsgi())
+
+
+# Runs in every worker after the fork, the chart rendering processes of the
+# worker are started before it accepts requests
+def post_worker_init(worker):
+    app = worker.app.wsgi()
+    if app.config['CHART_WORKERS']:
+        from charts import start_render_pool
+        start_render_pool(app.config['CHART_WORKERS'])
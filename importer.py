@@ -0,0 +1,162 @@
+import io
+import re
+import math
+import csv
+from datetime import date, datetime
+from forms import income_choices, outcome_choices
+from models import db, Income, Outcome
+from queries import bump_data_version
+from balances import add_rows_to_totals
+
+
+MODELS = {'income': Income, 'outcome': Outcome}
+
+# Valid types of each kind of transaction (case insensitive) -> stored value
+TYPES = {
+    'income': {value.lower(): value for value, _ in income_choices},
+    'outcome': {value.lower(): value for value, _ in outcome_choices}
+}
+
+# Only the first errors are kept for the report, the file can have any size
+MAX_REPORTED_ERRORS = 20
+
+# <TAG>value pairs of an OFX (SGML or XML) statement
+OFX_TAG = re.compile(r'<(/?\w+)>([^<\r\n]*)')
+
+
+# Imports the transactions of a bank statement (CSV or OFX) for the user.
+# The file is read as a stream and the valid rows are inserted in batches of
+# chunk_size with executemany, without creating one ORM object per row, so the
+# memory used does not depend on the size of the file. Every row is saved with
+# a single commit at the end. Returns the number of imported and skipped rows
+# and the first errors found
+def import_statement(user_id, stream, file_format, chunk_size):
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    rows = read_ofx(text) if file_format == 'ofx' else read_csv(text)
+
+    report = {'imported': 0, 'skipped': 0, 'errors': []}
+    pending = {'income': [], 'outcome': []}
+
+    try:
+        for line, row in rows:
+            try:
+                kind, values = parse_row(row)
+            except ValueError as error:
+                report['skipped'] += 1
+                if len(report['errors']) < MAX_REPORTED_ERRORS:
+                    report['errors'].append(f'Line {line}: {error}')
+                continue
+
+            values['user_id'] = user_id
+            pending[kind].append(values)
+            if len(pending[kind]) >= chunk_size:
+                report['imported'] += insert_chunk(kind, pending[kind])
+    except UnicodeDecodeError:
+        # Nothing of a file that can not be read is imported
+        db.session.rollback()
+        text.detach()
+        return {'imported': 0, 'skipped': 0, 'errors': ['The file must be encoded in UTF-8']}
+    except ValueError as error:
+        # Malformed file (read_csv/read_ofx), the chunks already sent are undone
+        db.session.rollback()
+        text.detach()
+        return {'imported': 0, 'skipped': 0, 'errors': [f'The file could not be read, {error}']}
+
+    for kind in pending:
+        report['imported'] += insert_chunk(kind, pending[kind])
+
+    if report['imported']:
+        bump_data_version(user_id)
+    db.session.commit()
+    text.detach()
+
+    return report
+
+
+# Inserts the rows with a single executemany (Core insert of the table, the
+# ORM bulk path is skipped), updates the totals and rollups and empties the list
+def insert_chunk(kind, rows):
+    if rows:
+        db.session.execute(MODELS[kind].__table__.insert(), rows)
+        add_rows_to_totals(db.session, kind, rows)
+    inserted = len(rows)
+    rows.clear()
+    return inserted
+
+
+# CSV with a header row: date, amount and description are required, kind
+# (income/outcome) and type are optional. Without kind the sign of the amount
+# decides it (negative amounts are outcomes), without type 'Other' is used.
+# Raises ValueError with the line when the file is not a valid CSV
+def read_csv(text):
+    reader = csv.DictReader(text)
+    try:
+        if reader.fieldnames:
+            reader.fieldnames = [name.strip().lower() for name in reader.fieldnames]
+
+        for row in reader:
+            yield reader.line_num, row
+    except csv.Error as error:
+        # line_num does not count the line that failed yet
+        raise ValueError(f'line {reader.line_num + 1}: {error}')
+
+
+# Transactions (<STMTTRN> blocks) of an OFX statement, read line by line
+def read_ofx(text):
+    transaction = None
+    for line_number, line in enumerate(text, start=1):
+        for tag, value in OFX_TAG.findall(line):
+            tag = tag.upper()
+            if tag == 'STMTTRN':
+                transaction = {'line': line_number}
+            elif tag == '/STMTTRN' and transaction is not None:
+                yield transaction['line'], {
+                    'date': transaction.get('DTPOSTED', '')[:8],
+                    'amount': transaction.get('TRNAMT', ''),
+                    'description': transaction.get('MEMO') or transaction.get('NAME', '')
+                }
+                transaction = None
+            elif transaction is not None and not tag.startswith('/'):
+                transaction[tag] = value.strip()
+
+
+# Validated values of a row, raises ValueError with the problem of the row
+def parse_row(row):
+    try:
+        amount = float(row.get('amount') or '')
+    except ValueError:
+        raise ValueError('amount must be a number')
+    if not math.isfinite(amount):
+        raise ValueError('amount must be a number')
+
+    kind = (row.get('kind') or '').strip().lower()
+    if not kind:
+        kind = 'outcome' if amount < 0 else 'income'
+    if kind not in TYPES:
+        raise ValueError("kind must be 'income' or 'outcome'")
+
+    transaction_type = TYPES[kind].get((row.get('type') or 'Other').strip().lower())
+    if transaction_type is None:
+        raise ValueError(f'invalid {kind} type {row.get("type")!r}')
+
+    description = (row.get('description') or '').strip()[:255]
+    if not description:
+        raise ValueError('description is required')
+
+    return kind, {
+        'amount': abs(amount),
+        'type': transaction_type,
+        'description': description,
+        'date': parse_date(row.get('date'))
+    }
+
+
+# Dates as YYYY-MM-DD (CSV) or YYYYMMDD (OFX)
+def parse_date(value):
+    value = (value or '').strip()
+    try:
+        if len(value) == 8 and value.isdigit():
+            return datetime.strptime(value, '%Y%m%d').date()
+        return date.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f'invalid date {value!r}, expected YYYY-MM-DD')
@@ -0,0 +1,121 @@
+import hmac
+import time
+from flask import Blueprint, Response, g, request, abort, current_app, has_request_context
+from sqlalchemy import event
+from models import db
+import metrics
+
+
+# Per request timings: wall time, database time and number of queries (engine
+# events) and time spent rendering or waiting for the plots (charts.py). Sent
+# in a Server-Timing header to the admin requests only (is_admin_request, the
+# timings say too much about the internals) and aggregated per endpoint in
+# histograms shared by all the workers (metrics.py). With INSTRUMENTATION off
+# nothing is registered at all. /metrics is matched before the dashboard of
+# the users (/<username>), the username is reserved (forms.RESERVED_USERNAMES)
+instrumentation = Blueprint('instrumentation', __name__)
+
+# Measure of the request -> histogram (buckets in metrics.METRICS)
+HISTOGRAMS = {
+    'wall_seconds': 'http_request_duration_seconds',
+    'db_seconds': 'http_request_db_seconds',
+    'queries': 'http_request_db_queries',
+    'render_seconds': 'http_request_render_seconds'
+}
+
+_enabled = False
+
+
+def init_instrumentation(app):
+    global _enabled
+
+    if not app.config['INSTRUMENTATION']:
+        return
+
+    _enabled = True
+    metrics.configure_metrics(app.config['METRICS_DIR'])
+    app.before_request(start_timing)
+    app.after_request(finish_timing)
+    app.register_blueprint(instrumentation)
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    event.listen(engine, 'after_cursor_execute', after_cursor_execute)
+
+
+def start_timing():
+    g.timing = {'start': time.perf_counter(), 'db_seconds': 0.0, 'queries': 0, 'render_seconds': 0.0}
+
+
+def finish_timing(response):
+    timing = g.pop('timing', None)
+    if timing is None:
+        return response
+
+    timing['wall_seconds'] = time.perf_counter() - timing.pop('start')
+    endpoint = request.endpoint or 'not_found'
+    metrics.inc('http_requests_total', {'endpoint': endpoint, 'method': request.method, 'status': response.status_code})
+    for name, histogram in HISTOGRAMS.items():
+        metrics.observe(histogram, {'endpoint': endpoint}, timing[name])
+
+    if not is_admin_request():
+        return response
+
+    header = [
+        f'app;dur={timing["wall_seconds"] * 1000:.1f}',
+        f'db;dur={timing["db_seconds"] * 1000:.1f};desc="{timing["queries"]} queries"'
+    ]
+    if timing['render_seconds']:
+        header.append(f'render;dur={timing["render_seconds"] * 1000:.1f}')
+    response.headers['Server-Timing'] = ', '.join(header)
+    return response
+
+
+# Adds time to a measure of the current request (no-op outside of requests or
+# with the instrumentation off)
+def record_timing(name, seconds):
+    if has_request_context():
+        timing = g.get('timing')
+        if timing is not None:
+            timing[name] += seconds
+
+
+# Counts an event (cache hits, renders...), no-op with the instrumentation off
+def record_event(name, **labels):
+    if _enabled:
+        metrics.inc(name, labels)
+
+
+# A connection runs one statement at a time, a single start time is kept (a
+# statement that fails never reaches after_cursor_execute, the next one
+# replaces its start)
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info['query_start'] = time.perf_counter()
+
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info.pop('query_start')
+    if has_request_context():
+        timing = g.get('timing')
+        if timing is not None:
+            timing['db_seconds'] += elapsed
+            timing['queries'] += 1
+
+
+# Requests with the token of the config (ADMIN_TOKEN) in the X-Admin-Token
+# header or as bearer token (Prometheus scrapes), the admin routes do not
+# exist when no token is configured
+def is_admin_request():
+    token = current_app.config.get('ADMIN_TOKEN')
+    given = request.headers.get('X-Admin-Token') or request.headers.get('Authorization', '').removeprefix('Bearer ')
+    return bool(token) and hmac.compare_digest(given.encode(), token.encode())
+
+
+# Metrics of every worker in the Prometheus text format
+@instrumentation.route('/metrics')
+def metrics_exposition():
+    if not is_admin_request():
+        abort(404)
+
+    return Response(metrics.exposition(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,219 @@
+import os
+import glob
+import json
+import mmap
+import struct
+import threading
+
+
+# Counters shared by all the processes of the app (gunicorn workers). Every
+# process adds to its own file of METRICS_DIR, memory mapped, and the
+# exposition (/metrics) adds up the files of every process: a single
+# endpoint returns the metrics of all the workers. Without a directory the
+# counters are kept in the memory of the process
+
+# Upper bounds of the buckets of the histograms (Prometheus default buckets
+# for the seconds, the last bucket is +Inf)
+TIME_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200)
+
+# Name -> (type, help, buckets) of the exposed metrics
+METRICS = {
+    'http_requests_total': ('counter', 'Requests served per endpoint, method and status.', None),
+    'http_request_duration_seconds': ('histogram', 'Wall time of the requests.', TIME_BUCKETS),
+    'http_request_db_seconds': ('histogram', 'Time of the requests spent in database queries.', TIME_BUCKETS),
+    'http_request_db_queries': ('histogram', 'Database queries per request.', QUERY_BUCKETS),
+    'http_request_render_seconds': ('histogram', 'Time of the requests spent rendering or waiting for plots.', TIME_BUCKETS),
+    'plot_cache_requests_total': ('counter', 'Plot requests served from the cache (hit) or rendered (miss).', None),
+    'plot_renders_total': ('counter', 'Plot bundles rendered, in the request or by the chart pool.', None),
+    'user_cache_requests_total': ('counter', 'User identities found in the cache (hit) or loaded (miss).', None),
+}
+
+# Size of a new file of counters, it grows when it is full
+INITIAL_SIZE = 64 * 1024
+
+_directory = None
+_counters = None
+_counters_pid = None
+_counters_lock = threading.Lock()
+
+
+# File of counters of one process: a header with the used bytes and entries
+# of (key length, key, padding, value) with the values aligned to 8 bytes
+class MmapCounters:
+    def __init__(self, path):
+        self.lock = threading.Lock()
+        self.file = open(path, 'a+b')
+        if os.fstat(self.file.fileno()).st_size == 0:
+            self.file.truncate(INITIAL_SIZE)
+        self.capacity = os.fstat(self.file.fileno()).st_size
+        self.map = mmap.mmap(self.file.fileno(), self.capacity)
+        if struct.unpack_from('i', self.map, 0)[0] == 0:
+            struct.pack_into('i', self.map, 0, 8)
+        self.positions = {key: offset for key, offset, _ in read_entries(self.map)}
+
+    def inc(self, key, amount=1):
+        with self.lock:
+            offset = self.positions.get(key)
+            if offset is None:
+                offset = self.add(key)
+            value = struct.unpack_from('d', self.map, offset)[0]
+            struct.pack_into('d', self.map, offset, value + amount)
+
+    def add(self, key):
+        data = key.encode()
+        padding = (8 - (4 + len(data)) % 8) % 8
+        size = 4 + len(data) + padding + 8
+        used = struct.unpack_from('i', self.map, 0)[0]
+
+        if used + size > self.capacity:
+            while used + size > self.capacity:
+                self.capacity *= 2
+            self.map.close()
+            self.file.truncate(self.capacity)
+            self.map = mmap.mmap(self.file.fileno(), self.capacity)
+
+        struct.pack_into(f'=i{len(data)}s{padding}xd', self.map, used, len(data), data, 0.0)
+        # The used size is written last, readers never see half an entry
+        struct.pack_into('i', self.map, 0, used + size)
+
+        self.positions[key] = used + size - 8
+        return self.positions[key]
+
+
+# Counters of the process when there is no directory
+class MemoryCounters:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.values = {}
+
+    def inc(self, key, amount=1):
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+
+# (key, offset of the value, value) of every entry of a file of counters
+def read_entries(buffer):
+    used = struct.unpack_from('i', buffer, 0)[0]
+    offset = 8
+    while offset < used:
+        length = struct.unpack_from('i', buffer, offset)[0]
+        key = bytes(buffer[offset + 4:offset + 4 + length]).decode()
+        value_offset = offset + 4 + length + (8 - (4 + length) % 8) % 8
+        yield key, value_offset, struct.unpack_from('d', buffer, value_offset)[0]
+        offset = value_offset + 8
+
+
+# Directory of the counters of the processes (None keeps them in memory)
+def configure_metrics(directory):
+    global _directory, _counters
+    _directory = directory
+    _counters = None
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+
+# Removes the counters of a previous run, called before the workers start
+def clear_metrics(directory):
+    for path in glob.glob(os.path.join(directory, 'metrics_*.db')):
+        os.remove(path)
+
+
+# Counters of the current process, a forked worker opens its own file
+def get_counters():
+    global _counters, _counters_pid
+
+    with _counters_lock:
+        if _counters is None or (_directory and _counters_pid != os.getpid()):
+            if _directory:
+                _counters = MmapCounters(os.path.join(_directory, f'metrics_{os.getpid()}.db'))
+            else:
+                _counters = MemoryCounters()
+            _counters_pid = os.getpid()
+        return _counters
+
+
+# Metrics are stored with the name and labels of the sample as key
+def sample_key(name, labels):
+    return json.dumps([name, sorted(labels.items())])
+
+
+def inc(name, labels, amount=1):
+    get_counters().inc(sample_key(name, labels), amount)
+
+
+# Histograms are stored per bucket (not cumulative), plus their sum and count
+def observe(name, labels, value):
+    counters = get_counters()
+    bound = next((bucket for bucket in METRICS[name][2] if value <= bucket), '+Inf')
+    counters.inc(sample_key(name + '_bucket', dict(labels, le=str(bound))))
+    counters.inc(sample_key(name + '_sum', labels), value)
+    counters.inc(sample_key(name + '_count', labels))
+
+
+# Values of every key added up for all the processes
+def collect():
+    if not _directory:
+        counters = get_counters()
+        with counters.lock:
+            return dict(counters.values)
+
+    totals = {}
+    for path in glob.glob(os.path.join(_directory, 'metrics_*.db')):
+        with open(path, 'rb') as counters_file:
+            for key, _, value in read_entries(counters_file.read()):
+                totals[key] = totals.get(key, 0) + value
+    return totals
+
+
+# Metrics in the Prometheus text format
+def exposition():
+    samples = {}
+    for key, value in collect().items():
+        name, labels = json.loads(key)
+        samples.setdefault(name, []).append((dict(labels), value))
+
+    lines = []
+    for name, (metric_type, description, buckets) in METRICS.items():
+        lines.append(f'# HELP {name} {description}')
+        lines.append(f'# TYPE {name} {metric_type}')
+        if metric_type == 'counter':
+            for labels, value in sorted(samples.get(name, []), key=lambda sample: sorted(sample[0].items())):
+                lines.append(sample_line(name, labels, value))
+        else:
+            lines.extend(histogram_lines(name, samples, buckets))
+    return '\n'.join(lines) + '\n'
+
+
+# Every bucket of every series of a histogram made cumulative, plus its sum
+# and count
+def histogram_lines(name, samples, buckets):
+    series = {}
+    for suffix in ('_bucket', '_sum', '_count'):
+        for labels, value in samples.get(name + suffix, []):
+            bound = labels.pop('le', None)
+            values = series.setdefault(tuple(sorted(labels.items())), {'buckets': {}})
+            if bound is None:
+                values[suffix] = value
+            else:
+                values['buckets'][bound] = value
+
+    lines = []
+    for labels, values in sorted(series.items()):
+        total = 0
+        for bound in [str(bucket) for bucket in buckets] + ['+Inf']:
+            total += values['buckets'].get(bound, 0)
+            lines.append(sample_line(name + '_bucket', dict(labels, le=bound), total))
+        lines.append(sample_line(name + '_sum', dict(labels), values.get('_sum', 0)))
+        lines.append(sample_line(name + '_count', dict(labels), values.get('_count', 0)))
+    return lines
+
+
+def sample_line(name, labels, value):
+    if labels:
+        name += '{' + ','.join(f'{key}="{escape(label)}"' for key, label in labels.items()) + '}'
+    return f'{name} {int(value) if float(value).is_integer() else value}'
+
+
+def escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
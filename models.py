@@ -1,8 +1,10 @@
+from flask import current_app
 from flask_sqlalchemy import SQLAlchemy
 from sqlalchemy import Enum
 from flask_login import UserMixin
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import date
+from functools import lru_cache
 db = SQLAlchemy()
 
 class User(UserMixin, db.Model):
@@ -12,6 +14,11 @@ class User(UserMixin, db.Model):
     savings = db.Column(db.Float, default=0.0)
     debt = db.Column(db.Float, default=0.0)
     password = db.Column(db.String(255), nullable=False)
+    # Bumped on every change of the incomes/outcomes, used to invalidate the cached plots
+    data_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    # Running totals of the incomes/outcomes, kept up to date by balances.py
+    total_income = db.Column(db.Float, nullable=False, default=0.0, server_default='0')
+    total_outcome = db.Column(db.Float, nullable=False, default=0.0, server_default='0')
 
     incomes = db.relationship(
         'Income', 
@@ -25,15 +32,42 @@ class User(UserMixin, db.Model):
         lazy=True, 
         cascade="all, delete-orphan"
     )
+    monthly_totals = db.relationship(
+        'MonthlyTotal',
+        lazy=True,
+        cascade="all, delete-orphan"
+    )
+
+    @property
+    def balance(self):
+        return self.total_income - self.total_outcome
 
     def set_password(self, password):
-        self.password = generate_password_hash(password)
+        self.password = generate_password_hash(password, method=current_app.config['PASSWORD_HASH_METHOD'])
     
     def check_password(self, password):
         return check_password_hash(self.password, password)
 
+    # True when the stored hash was made with other method or work factor than
+    # the configured one, the password is hashed again on the next login
+    def password_needs_rehash(self):
+        return self.password.split('$', 1)[0] != hash_parameters(current_app.config['PASSWORD_HASH_METHOD'])
+
+
+# Full method and parameters werkzeug writes for a configured method, for
+# example 'scrypt' -> 'scrypt:32768:8:1' (hashed once per method and process)
+@lru_cache
+def hash_parameters(method):
+    return generate_password_hash('', method=method).split('$', 1)[0]
+
 
 class Income(db.Model):
+    # Every query filters by user and listings sort by date (the dashboard
+    # totals are read from monthly_total)
+    __table_args__ = (
+        db.Index('ix_income_user_id_date', 'user_id', 'date'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete="CASCADE"), nullable=False)
     amount = db.Column(db.Float, nullable=False)
@@ -47,6 +81,10 @@ class Income(db.Model):
 
 
 class Outcome(db.Model):
+    __table_args__ = (
+        db.Index('ix_outcome_user_id_date', 'user_id', 'date'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete="CASCADE"), nullable=False)
     amount = db.Column(db.Float, nullable=False)
@@ -57,3 +95,14 @@ class Outcome(db.Model):
     )
     description = db.Column(db.String(255))
     date = db.Column(db.Date, nullable=False, index=True, default=date.today)
+
+
+# Totals of the transactions of a user per month, kind and type, kept up to
+# date by balances.py on every add/edit/delete (rebuilt with flask rebuild-rollups)
+class MonthlyTotal(db.Model):
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete="CASCADE"), primary_key=True)
+    month = db.Column(db.String(7), primary_key=True)  # 'YYYY-MM'
+    kind = db.Column(db.String(7), primary_key=True)  # 'income' or 'outcome'
+    type = db.Column(db.String(13), primary_key=True)
+    total = db.Column(db.Float, nullable=False, default=0.0)
+    count = db.Column(db.Integer, nullable=False, default=0)
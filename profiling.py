@@ -0,0 +1,233 @@
+import os
+import re
+import json
+import time
+import uuid
+import pstats
+import cProfile
+import threading
+import tracemalloc
+from collections import defaultdict
+from flask import Blueprint, g, request, jsonify, send_file, abort, current_app
+from flask_login import current_user
+from instrumentation import is_admin_request
+
+
+# Profiling of single requests in production: an admin request with the
+# X-Profile header (or ?profile=) runs under cProfile, 'memory' also traces
+# the allocations with tracemalloc. The results are saved in PROFILE_DIR with
+# the id sent back in the X-Profile-Id header and downloaded from
+# /admin/profiles/<id>.<format>:
+#   pstats     cProfile stats (python -m pstats, snakeviz)
+#   collapsed  collapsed stacks (flamegraph.pl, speedscope), built from the
+#              call graph of cProfile
+#   memory     allocations by line and peak memory of the request
+# Only one request per process is profiled at a time. The plots rendered by
+# the chart pool run in other processes, only the wait is seen (CHART_WORKERS=0
+# renders them in the profiled request)
+profiling = Blueprint('profiling', __name__, url_prefix='/admin/profiles')
+
+PROFILE_FORMATS = {
+    'pstats': 'application/octet-stream',
+    'collapsed': 'text/plain',
+    'memory': 'text/plain',
+}
+
+# Allocation lines of the memory report, frames of the collapsed stacks and
+# time under which a branch of the stacks is not followed (seconds)
+MEMORY_TOP = 50
+MAX_DEPTH = 100
+MIN_SECONDS = 0.00001
+
+PROFILE_ID = re.compile(r'^[0-9a-f]{32}$')
+
+_profile_lock = threading.Lock()
+
+
+def init_profiling(app):
+    app.before_request(start_profile)
+    app.after_request(finish_profile)
+    app.teardown_request(stop_profile)
+    app.register_blueprint(profiling)
+
+
+# 'cpu' or 'memory' when the request asks to be profiled (and may be)
+def requested_profile():
+    value = request.headers.get('X-Profile') or request.args.get('profile')
+    if not value or not is_admin_request():
+        return None
+    return 'memory' if value == 'memory' else 'cpu'
+
+
+def start_profile():
+    mode = requested_profile()
+    if mode is None:
+        return
+    if not _profile_lock.acquire(blocking=False):
+        g.profile = {'busy': True}
+        return
+
+    g.profile = {'id': uuid.uuid4().hex, 'mode': mode, 'start': time.perf_counter(), 'tracing': False}
+    if mode == 'memory' and not tracemalloc.is_tracing():
+        tracemalloc.start()
+        g.profile['tracing'] = True
+    g.profile['profiler'] = profiler = cProfile.Profile()
+    profiler.enable()
+
+
+def finish_profile(response):
+    profile = g.get('profile')
+    if profile is None:
+        return response
+    if profile.get('busy'):
+        g.pop('profile')
+        response.headers['X-Profile-Id'] = 'busy'
+        return response
+
+    profile['profiler'].disable()
+    profile['seconds'] = time.perf_counter() - profile['start']
+    snapshot = tracemalloc.take_snapshot() if profile['mode'] == 'memory' else None
+    peak = tracemalloc.get_traced_memory()[1] if snapshot else None
+    stop_profile()
+
+    save_profile(profile, response.status_code, snapshot, peak)
+    response.headers['X-Profile-Id'] = profile['id']
+    return response
+
+
+# Stops the profiler and frees the lock, also when the view raised
+def stop_profile(error=None):
+    profile = g.pop('profile', None)
+    if profile is None or profile.get('busy'):
+        return
+
+    profile['profiler'].disable()
+    if profile['tracing']:
+        tracemalloc.stop()
+    _profile_lock.release()
+
+
+def save_profile(profile, status, snapshot, peak):
+    directory = current_app.config['PROFILE_DIR']
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, profile['id'])
+
+    stats = pstats.Stats(profile['profiler'])
+    stats.dump_stats(path + '.pstats')
+    with open(path + '.collapsed', 'w') as collapsed:
+        for stack, microseconds in collapsed_stacks(stats):
+            collapsed.write(f'{stack} {microseconds}\n')
+
+    formats = ['pstats', 'collapsed']
+    if snapshot is not None:
+        with open(path + '.memory', 'w') as memory:
+            memory.write(f'peak {peak / 1024:.1f} KiB\n\n')
+            for statistic in snapshot.statistics('lineno')[:MEMORY_TOP]:
+                memory.write(f'{statistic}\n')
+        formats.append('memory')
+
+    # Written last, the profile is listed once its files are complete
+    with open(path + '.json', 'w') as metadata:
+        json.dump({
+            'id': profile['id'],
+            'created': time.time(),
+            'method': request.method,
+            'path': request.full_path.rstrip('?'),
+            'endpoint': request.endpoint,
+            'user_id': current_user.get_id(),
+            'status': status,
+            'seconds': round(profile['seconds'], 6),
+            'formats': formats,
+        }, metadata)
+
+    remove_old_profiles(directory, current_app.config['PROFILE_KEEP'])
+
+
+def remove_old_profiles(directory, keep):
+    profiles = sorted(
+        (name for name in os.listdir(directory) if name.endswith('.json')),
+        key=lambda name: os.path.getmtime(os.path.join(directory, name)),
+        reverse=True
+    )
+    for name in profiles[keep:]:
+        for file_format in ['json', *PROFILE_FORMATS]:
+            try:
+                os.remove(os.path.join(directory, name[:-len('json')] + file_format))
+            except FileNotFoundError:
+                pass
+
+
+# Collapsed stacks (`caller;callee;... microseconds`) from the call graph of
+# cProfile: the time of a function is split among the functions it calls in
+# proportion to the time each call took from it, so the stacks are estimated
+# (cProfile does not record complete stacks)
+def collapsed_stacks(stats):
+    entries = stats.stats
+    callees = defaultdict(list)
+    for function, (_, _, _, _, callers) in entries.items():
+        for caller, (_, _, _, cumulative) in callers.items():
+            if caller in entries:
+                callees[caller].append((function, cumulative))
+
+    totals = defaultdict(float)
+
+    # `path` are the functions of the stack, a function already in it (recursion)
+    # is not walked again
+    def walk(function, seconds, path):
+        _, _, own, cumulative, _ = entries[function]
+        if cumulative <= 0 or seconds < MIN_SECONDS:
+            return
+        path = path + (function,)
+        totals[path] += seconds * own / cumulative
+        if len(path) >= MAX_DEPTH:
+            return
+        for callee, edge in callees[function]:
+            if callee not in path and edge > 0:
+                walk(callee, seconds * edge / cumulative, path)
+
+    # Roots: functions called by frames that were already running when the
+    # profiler started
+    for function, (_, _, _, cumulative, callers) in entries.items():
+        if not any(caller in entries for caller in callers):
+            walk(function, cumulative, ())
+
+    return [
+        (';'.join(frame_name(function) for function in path), round(seconds * 1e6))
+        for path, seconds in totals.items() if round(seconds * 1e6)
+    ]
+
+
+def frame_name(function):
+    filename, line, name = function
+    if filename == '~':
+        return name.replace(';', ',')
+    return f'{name} ({os.path.basename(filename)}:{line})'.replace(';', ',')
+
+
+# Profiles saved, the newest first
+@profiling.route('')
+def list_profiles():
+    if not is_admin_request():
+        abort(404)
+
+    directory = current_app.config['PROFILE_DIR']
+    profiles = []
+    if os.path.isdir(directory):
+        for name in os.listdir(directory):
+            if name.endswith('.json'):
+                with open(os.path.join(directory, name)) as metadata:
+                    profiles.append(json.load(metadata))
+    profiles.sort(key=lambda profile: profile['created'], reverse=True)
+    return jsonify(profiles=profiles)
+
+
+@profiling.route('/<profile_id>.<file_format>')
+def download_profile(profile_id, file_format):
+    if not is_admin_request() or not PROFILE_ID.match(profile_id) or file_format not in PROFILE_FORMATS:
+        abort(404)
+
+    path = os.path.join(current_app.config['PROFILE_DIR'], f'{profile_id}.{file_format}')
+    if not os.path.isfile(path):
+        abort(404)
+    return send_file(path, mimetype=PROFILE_FORMATS[file_format], as_attachment=True,
+                     download_name=f'profile-{profile_id}.{file_format}')
@@ -0,0 +1,138 @@
+from sqlalchemy import func, literal, type_coerce, union_all
+from datetime import date
+from models import db, User, Income, Outcome, MonthlyTotal
+
+
+# Running totals and data version of the user, a single primary key lookup
+# (None if the user does not exist anymore)
+def get_totals(user_id):
+    return db.session.execute(
+        db.select(User.total_income, User.total_outcome, User.data_version).where(User.id == user_id)
+    ).one_or_none()
+
+
+# Totals per kind and type of one month ('YYYY-MM') of the user, read from the
+# monthly rollup (a few rows) instead of the transactions of the month
+def get_month_totals(user_id, month):
+    totals = {'income': {}, 'outcome': {}}
+    query = (
+        db.select(MonthlyTotal.kind, MonthlyTotal.type, MonthlyTotal.total)
+        .where(MonthlyTotal.user_id == user_id, MonthlyTotal.month == month)
+    )
+    for kind, transaction_type, total in db.session.execute(query):
+        totals[kind][transaction_type] = total
+    return totals
+
+
+# Income and outcome of every month between first_month and last_month
+# (inclusive, 'YYYY-MM'), as [(month, income, outcome)] sorted by month. Only
+# the months with transactions are returned
+def get_monthly_trend(user_id, first_month, last_month):
+    query = (
+        db.select(MonthlyTotal.month, MonthlyTotal.kind, func.sum(MonthlyTotal.total))
+        .where(
+            MonthlyTotal.user_id == user_id,
+            MonthlyTotal.month >= first_month,
+            MonthlyTotal.month <= last_month
+        )
+        .group_by(MonthlyTotal.month, MonthlyTotal.kind)
+        .order_by(MonthlyTotal.month)
+    )
+
+    trend = {}
+    for month, kind, total in db.session.execute(query):
+        trend.setdefault(month, {'income': 0.0, 'outcome': 0.0})[kind] = total
+    return [(month, totals['income'], totals['outcome']) for month, totals in trend.items()]
+
+
+# Every row of the monthly rollup of the user (month, kind, type, total) sorted
+# by month, all the dashboard charts are built from this single query
+def get_chart_rows(user_id):
+    return db.session.execute(
+        db.select(MonthlyTotal.month, MonthlyTotal.kind, MonthlyTotal.type, MonthlyTotal.total)
+        .where(MonthlyTotal.user_id == user_id)
+        .order_by(MonthlyTotal.month)
+    ).all()
+
+
+# Version of the transactions of the user, it changes on every add/edit/delete
+# (None if the user does not exist anymore)
+def get_data_version(user_id):
+    return db.session.scalar(db.select(User.data_version).where(User.id == user_id))
+
+
+# Marks the transactions of the user as changed (invalidates the cached plots).
+# The increment is done by the database so concurrent workers never lose an update
+def bump_data_version(user_id):
+    db.session.execute(
+        db.update(User)
+        .where(User.id == user_id)
+        .values(data_version=User.data_version + 1)
+    )
+
+
+# One page of the transactions (incomes and outcomes) of the user, newest first.
+# Keyset pagination: the page starts right after the cursor (date, kind, id) of
+# the last row of the previous page, so every page is an index range read on
+# (user_id, date) and costs the same no matter how deep in the history it is.
+# Returns the rows and the cursor of the next page (None on the last page)
+def get_transactions_page(user_id, limit, cursor=None):
+    branches = []
+    for kind, model in (('income', Income), ('outcome', Outcome)):
+        branch = (
+            db.select(
+                literal(kind).label('kind'),
+                model.id,
+                type_coerce(model.type, db.String).label('type'),
+                model.amount,
+                model.description,
+                model.date
+            )
+            .where(model.user_id == user_id)
+        )
+
+        # Rows are sorted by date, kind and id (descending), the kind is fixed
+        # on each branch so the condition only needs date and id
+        if cursor:
+            cursor_date, cursor_kind, cursor_id = cursor
+            if kind < cursor_kind:
+                branch = branch.where(model.date <= cursor_date)
+            elif kind > cursor_kind:
+                branch = branch.where(model.date < cursor_date)
+            else:
+                branch = branch.where(db.tuple_(model.date, model.id) < (cursor_date, cursor_id))
+
+        branches.append(
+            branch.order_by(model.date.desc(), model.id.desc()).limit(limit + 1).subquery()
+        )
+
+    # Each branch already returns at most one page (plus one row to know if
+    # there is a next page), only those rows are merged and sorted
+    transactions = union_all(*[db.select(branch) for branch in branches]).subquery()
+    rows = db.session.execute(
+        db.select(transactions)
+        .order_by(transactions.c.date.desc(), transactions.c.kind.desc(), transactions.c.id.desc())
+        .limit(limit + 1)
+    ).mappings().all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = (last['date'], last['kind'], last['id'])
+
+    return rows, next_cursor
+
+
+# Cursors travel in the urls as 'date_kind_id', for example '2024-05-31_income_42'
+def encode_cursor(cursor):
+    cursor_date, kind, id = cursor
+    return f'{cursor_date.isoformat()}_{kind}_{id}'
+
+
+# Raises ValueError when the cursor is not valid
+def decode_cursor(value):
+    cursor_date, kind, id = value.split('_')
+    if kind not in ('income', 'outcome'):
+        raise ValueError(f'Invalid transaction kind: {kind}')
+    return date.fromisoformat(cursor_date), kind, int(id)
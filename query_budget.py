@@ -0,0 +1,123 @@
+from flask import g, request, current_app, has_request_context
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from models import db
+
+
+# Query budget of the routes: every statement sent to the database during a
+# request is recorded and checked when the response is ready. A request fails
+# the check when it sends more statements than the budget declared on its view
+# (@query_budget) or when the same statement is sent many times with other
+# parameters (a query per row, the N+1 of the lazy relationships). With
+# QUERY_BUDGET = 'raise' (TestingConfig, benchmarks/check_query_budgets.py) the
+# request raises QueryBudgetExceeded, with 'warn' it is logged, with 'off'
+# nothing is registered. The statements are also checked right before a
+# commit, so a request over its budget fails before storing anything: after a
+# commit the problems are only logged (the client would get an error for a
+# change that was saved). The queries of streamed responses, sent after the
+# check, are not counted
+
+
+# The same statement with other parameters this many times is reported
+REPEAT_LIMIT = 5
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+# Maximum number of statements of the requests of a view (round trips: an
+# executemany sent as one cursor execution counts as one) and of times a statement can be repeated with other parameters (None
+# for no limit). Views without budget are only checked for repeated statements
+def query_budget(limit, repeats=REPEAT_LIMIT):
+    def decorator(view):
+        view.query_budget = (limit, repeats)
+        return view
+    return decorator
+
+
+def init_query_budget(app):
+    mode = app.config['QUERY_BUDGET']
+    if mode == 'off':
+        return
+    if mode not in ('warn', 'raise'):
+        raise ValueError(f"QUERY_BUDGET must be 'off', 'warn' or 'raise', not {mode!r}")
+
+    app.before_request(start_query_log)
+    app.after_request(check_query_log)
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'after_cursor_execute', record_statement)
+    if not event.contains(Session, 'before_commit', check_before_commit):
+        event.listen(Session, 'before_commit', check_before_commit)
+        event.listen(Session, 'after_commit', mark_committed)
+
+
+def start_query_log():
+    g.query_log = []
+
+
+# Called once per cursor execution, also for each of the statements SQLAlchemy
+# sends for an executemany it can not batch (flagged executemany all the same)
+def record_statement(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context():
+        query_log = g.get('query_log')
+        if query_log is not None:
+            query_log.append((statement, parameters))
+
+
+def check_query_log(response):
+    if g.get('query_log') is not None:
+        report_problems()
+    g.pop('query_log', None)
+    return response
+
+
+def check_before_commit(session):
+    if has_request_context() and g.get('query_log') is not None:
+        report_problems()
+
+
+def mark_committed(session):
+    if has_request_context() and g.get('query_log') is not None:
+        g.query_committed = True
+
+
+# Raises or logs the problems of the statements sent so far, once per request
+def report_problems():
+    if g.get('query_reported'):
+        return
+    problems = query_problems(g.query_log, *view_budget())
+    if not problems:
+        return
+
+    g.query_reported = True
+    message = f'{request.method} {request.path} ({request.endpoint}): ' + '; '.join(problems)
+    if current_app.config['QUERY_BUDGET'] == 'raise' and not g.get('query_committed'):
+        raise QueryBudgetExceeded(message)
+    current_app.logger.warning('Query budget: %s', message)
+
+
+# (limit, repeats) declared on the view of the current request
+def view_budget():
+    view = current_app.view_functions.get(request.endpoint)
+    return getattr(view, 'query_budget', (None, REPEAT_LIMIT))
+
+
+# Descriptions of what is wrong with the statements of a request
+def query_problems(query_log, limit, repeats):
+    problems = []
+    if limit is not None and len(query_log) > limit:
+        problems.append(f'{len(query_log)} statements, budget {limit}')
+    if repeats is None:
+        return problems
+
+    parameters = {}
+    for statement, statement_parameters in query_log:
+        parameters.setdefault(statement, set()).add(repr(statement_parameters))
+    for statement, different in parameters.items():
+        if len(different) >= repeats:
+            problems.append(f'{len(different)} times with other parameters: {" ".join(statement.split())[:200]}')
+
+    return problems
@@ -0,0 +1,134 @@
+import io
+import threading
+
+
+# Rendering of the PNG charts. Runs in the processes of the chart pool (see
+# charts.py) or in the request threads when the pool is disabled. Only the
+# object oriented API of matplotlib is used: every thread draws on its own
+# Figure and Agg canvas, nothing goes through the global state of pyplot
+
+# Style of the charts (the seaborn whitegrid style, shipped with matplotlib)
+STYLE = 'seaborn-v0_8-whitegrid'
+
+# Charts of the current thread, created on its first render and reused
+_charts = threading.local()
+_init_lock = threading.Lock()
+_ready = False
+
+
+# Imports matplotlib and applies the style once per process, the charts only
+# read the style when they are created. Runs when a process of the pool starts
+# or before the first chart rendered in the request threads
+def init_worker():
+    global _ready
+
+    with _init_lock:
+        if not _ready:
+            import matplotlib
+            matplotlib.use('Agg')
+            import matplotlib.style
+            import matplotlib.figure
+            import matplotlib.backends.backend_agg
+            matplotlib.style.use(STYLE)
+            _ready = True
+
+
+# Bar chart of the total income and outcome. The figure, axis, bars and labels
+# are created once, every render only changes the heights and texts
+class IncomeOutcomeChart:
+    def __init__(self):
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+        self.figure = Figure(figsize=(10, 5))
+        FigureCanvasAgg(self.figure)
+        self.ax = self.figure.add_subplot()
+
+        self.bars = self.ax.bar(['Income', 'Outcome'], [0, 0], color=['green', 'red'], width=0.3)  # Ancho de las barras
+        self.labels = [
+            self.ax.text(
+                bar.get_x() + bar.get_width() / 2, 0, '',
+                ha='center',                         # Alineación horizontal
+                va='bottom'                          # Alineación vertical
+            )
+            for bar in self.bars
+        ]
+
+        # Room for the labels over the highest bar, no grid lines across the bars
+        self.ax.set_ymargin(0.1)
+        self.ax.grid(False, axis='x')
+
+        # Seting the title and labels
+        self.ax.set_title('Income vs Outcome')
+        self.ax.set_ylabel('Amount ($)')
+
+    def render(self, total_income, total_outcome):
+        # Add the values to the bars to show the total income and outcome on top of the bars
+        for bar, label, value in zip(self.bars, self.labels, [total_income, total_outcome]):
+            bar.set_height(value)
+            label.set_y(value)
+            label.set_text(f' {value}')
+
+        self.ax.relim()
+        self.ax.autoscale_view()
+
+        # Saving the plot to a memory buffer, nothing is written to disk
+        buffer = io.BytesIO()
+        self.figure.savefig(buffer, format='png')
+        return buffer.getvalue()
+
+
+# Chart of any series of charts.chart_series (bars or lines). The figure and
+# canvas are reused, the axis is cleared and drawn again on every render
+class SeriesChart:
+    def __init__(self):
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+        self.figure = Figure(figsize=(10, 5))
+        FigureCanvasAgg(self.figure)
+        self.ax = self.figure.add_subplot()
+
+    def render(self, series):
+        ax = self.ax
+        ax.clear()
+
+        for dataset in series['datasets']:
+            if series['type'] == 'bar':
+                ax.bar(series['labels'], dataset['data'], color=dataset['color'], width=0.5, label=dataset['label'])
+            else:
+                ax.plot(series['labels'], dataset['data'], color=dataset['color'], marker='o', label=dataset['label'])
+
+        if len(series['datasets']) > 1:
+            ax.legend()
+        ax.grid(False, axis='x')
+        ax.set_title(series['title'])
+        ax.set_ylabel('Amount ($)')
+
+        buffer = io.BytesIO()
+        self.figure.savefig(buffer, format='png')
+        return buffer.getvalue()
+
+
+# PNG of every chart of the series (charts.chart_series), rendered together
+def render_charts(series):
+    pngs = {}
+    for name, chart in series.items():
+        if name == 'income_outcome':
+            pngs[name] = render_income_outcome(*chart['datasets'][0]['data'])
+        else:
+            renderer = getattr(_charts, name, None)
+            if renderer is None:
+                init_worker()
+                renderer = SeriesChart()
+                setattr(_charts, name, renderer)
+            pngs[name] = renderer.render(chart)
+    return pngs
+
+
+def render_income_outcome(total_income, total_outcome):
+    chart = getattr(_charts, 'income_outcome', None)
+    if chart is None:
+        init_worker()
+        chart = _charts.income_outcome = IncomeOutcomeChart()
+    return chart.render(total_income, total_outcome)
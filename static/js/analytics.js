@@ -0,0 +1,35 @@
+// Muestra el desglose de gastos del dashboard con los datos de /api/v1/analytics.
+// Si la petición falla la sección queda oculta
+document.querySelectorAll('[data-analytics-url]').forEach(section => {
+    const money = new Intl.NumberFormat('es-ES', { minimumFractionDigits: 2, maximumFractionDigits: 2 });
+    const percent = new Intl.NumberFormat('es-ES', { style: 'percent', maximumFractionDigits: 1 });
+
+    fetch(section.dataset.analyticsUrl, { credentials: 'same-origin' })
+        .then(response => {
+            if (!response.ok) {
+                throw new Error(response.statusText);
+            }
+            return response.json();
+        })
+        .then(analytics => {
+            const categories = analytics.categories.outcome;
+            if (!categories.length) {
+                return;
+            }
+
+            // Una fila por categoría, de mayor a menor gasto
+            const body = section.querySelector('[data-categories]');
+            categories.forEach(category => {
+                const row = body.insertRow();
+                row.insertCell().textContent = category.type;
+                row.insertCell().textContent = money.format(category.total);
+                row.insertCell().textContent = percent.format(category.share);
+            });
+
+            if (analytics.savings_rate !== null) {
+                section.querySelector('[data-savings-rate]').textContent = percent.format(analytics.savings_rate);
+            }
+            section.hidden = false;
+        })
+        .catch(() => {});
+});
@@ -0,0 +1,60 @@
+// Dibuja los gráficos del dashboard en el navegador con las series de /api/v1/charts.
+// Si Chart.js o las series no están disponibles se muestra la imagen generada en el servidor
+document.querySelectorAll('[data-series-url]').forEach(container => {
+    const canvases = container.querySelectorAll('canvas[data-chart]');
+
+    // Reemplaza cada gráfico por su imagen PNG
+    const showImages = () => canvases.forEach(canvas => {
+        const image = document.createElement('img');
+        image.src = canvas.dataset.fallback;
+        image.className = canvas.className;
+        image.alt = canvas.getAttribute('aria-label');
+        canvas.replaceWith(image);
+    });
+
+    if (typeof Chart === 'undefined') {
+        showImages();
+        return;
+    }
+
+    fetch(container.dataset.seriesUrl, { credentials: 'same-origin' })
+        .then(response => {
+            if (!response.ok) {
+                throw new Error(response.statusText);
+            }
+            return response.json();
+        })
+        .then(series => canvases.forEach(canvas => {
+            const chart = series[canvas.dataset.chart];
+            if (chart) {
+                draw(canvas, chart);
+            }
+        }))
+        .catch(showImages);
+});
+
+// Un gráfico de Chart.js a partir de una serie (type, title, labels, datasets)
+function draw(canvas, chart) {
+    new Chart(canvas, {
+        type: chart.type,
+        data: {
+            labels: chart.labels,
+            datasets: chart.datasets.map(dataset => ({
+                label: dataset.label,
+                data: dataset.data,
+                backgroundColor: dataset.color,
+                borderColor: dataset.color
+            }))
+        },
+        options: {
+            aspectRatio: 2,  // Mismo tamaño que la imagen (10 x 5)
+            plugins: {
+                title: { display: true, text: chart.title },
+                legend: { display: chart.datasets.length > 1 }
+            },
+            scales: {
+                y: { beginAtZero: true }
+            }
+        }
+    });
+}
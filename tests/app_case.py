@@ -0,0 +1,27 @@
+# Base of the tests that go through the app
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from config import TestingConfig
+from models import db
+
+
+# App with TestingConfig (plus the values of `config`) and an empty in memory
+# database. With logged_in the client is logged in as the user ana
+class AppTestCase(unittest.TestCase):
+    config = {}
+    logged_in = True
+
+    def setUp(self):
+        self.app = create_app(TestingConfig, **self.config)
+        with self.app.app_context():
+            db.create_all()
+        self.client = self.app.test_client()
+
+        if self.logged_in:
+            self.client.post('/register', data={'username': 'ana', 'name': 'Ana', 'password': 'pw', 'confirm_password': 'pw'})
+            self.client.post('/', data={'username': 'ana', 'password': 'pw'})
@@ -0,0 +1,39 @@
+# Month table of the dashboard (?month=YYYY-MM)
+# Usage: python -m unittest discover tests
+import unittest
+from datetime import date
+
+from app_case import AppTestCase
+from app import month_start, add_months
+
+
+class MonthTableTest(AppTestCase):
+    def test_month_in_range(self):
+        response = self.client.get('/ana?month=2024-03')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('month=2024-02', response.get_data(as_text=True))
+        self.assertIn('month=2024-04', response.get_data(as_text=True))
+
+    def test_first_and_last_years_fall_back_to_the_current_month(self):
+        current = date.today().replace(day=1)
+        for value in ('9999-12', '0001-01'):
+            self.assertEqual(month_start(value), current)
+            response = self.client.get(f'/ana?month={value}')
+            self.assertEqual(response.status_code, 200)
+            self.assertIn(f"month={add_months(current, 1).strftime('%Y-%m')}", response.get_data(as_text=True))
+
+    def test_not_valid_month_falls_back_to_the_current_month(self):
+        for value in ('2024-13', 'abc', '2024', ''):
+            self.assertEqual(month_start(value), date.today().replace(day=1))
+
+
+class AnalyticsTest(AppTestCase):
+    def test_dashboard_loads_the_spending_breakdown(self):
+        html = self.client.get('/ana').get_data(as_text=True)
+        self.assertIn('data-analytics-url="/api/v1/analytics"', html)
+        self.assertIn('js/analytics.js', html)
+        self.assertEqual(self.client.get('/api/v1/analytics').status_code, 200)
+
+
+if __name__ == '__main__':
+    unittest.main()
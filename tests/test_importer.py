@@ -0,0 +1,40 @@
+# Imports of bank statements (importer.py)
+# Usage: python -m unittest discover tests
+import io
+import unittest
+
+from app_case import AppTestCase
+from models import db, User, Outcome, MonthlyTotal
+
+
+class ImportStatementTest(AppTestCase):
+    config = {'IMPORT_CHUNK_SIZE': 2}
+
+    def import_file(self, content, filename='statement.csv'):
+        return self.client.post('/import/ana', data={'file': (io.BytesIO(content), filename)}, follow_redirects=True)
+
+    def stored(self):
+        with self.app.app_context():
+            return (db.session.scalar(db.select(db.func.count()).select_from(Outcome)),
+                    db.session.scalar(db.select(User.total_outcome)),
+                    db.session.scalar(db.select(db.func.count()).select_from(MonthlyTotal)))
+
+    def test_valid_rows_are_imported(self):
+        self.import_file(b'date,amount,description\n2024-01-02,-5,a\n2024-01-03,-7,b\n2024-01-04,x,c\n')
+        self.assertEqual(self.stored(), (2, 12.0, 1))
+
+    def test_malformed_csv_is_rolled_back(self):
+        content = b'date,amount,description\n' + b'2024-01-02,-5,a\n' * 5 + b'2024-01-03,-7,' + b'b' * 200000 + b'\n'
+        page = self.import_file(content).get_data(as_text=True)
+        self.assertIn('The file could not be read, line 7', page)
+        self.assertEqual(self.stored(), (0, 0.0, 0))
+
+    def test_not_utf8_file_is_rolled_back(self):
+        content = b'date,amount,description\n' + b'2024-01-02,-5,a\n' * 5 + b'2024-01-03,-7,caf\xe9\n'
+        page = self.import_file(content).get_data(as_text=True)
+        self.assertIn('The file must be encoded in UTF-8', page)
+        self.assertEqual(self.stored(), (0, 0.0, 0))
+
+
+if __name__ == '__main__':
+    unittest.main()
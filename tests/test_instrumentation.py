@@ -0,0 +1,48 @@
+# Per request timings (instrumentation.py)
+# Usage: python -m unittest discover tests
+import unittest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from app_case import AppTestCase
+from models import db, User
+
+
+class ServerTimingTest(AppTestCase):
+    config = {'ADMIN_TOKEN': 'secret'}
+    logged_in = False
+
+    def test_only_admin_requests_get_the_timings(self):
+        self.assertNotIn('Server-Timing', self.client.get('/').headers)
+        self.assertNotIn('Server-Timing', self.client.get('/', headers={'X-Admin-Token': 'wrong'}).headers)
+        self.assertIn('db;dur=', self.client.get('/', headers={'X-Admin-Token': 'secret'}).headers['Server-Timing'])
+
+    def test_failed_statements_leave_no_start_time(self):
+        with self.app.app_context():
+            with db.engine.connect() as connection:
+                with self.assertRaises(OperationalError):
+                    connection.execute(text('SELECT * FROM missing_table'))
+                connection.execute(text('SELECT 1'))
+                self.assertNotIn('query_start', connection.info)
+
+
+class MetricsTest(AppTestCase):
+    config = {'ADMIN_TOKEN': 'secret'}
+    logged_in = False
+
+    def test_metrics_for_admin_requests_only(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 404)
+        response = self.client.get('/metrics', headers={'Authorization': 'Bearer secret'})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('http_request_duration_seconds', response.get_data(as_text=True))
+
+    def test_metrics_is_not_a_username(self):
+        self.client.post('/register', data={
+            'username': 'metrics', 'name': 'Metrics', 'password': 'pw', 'confirm_password': 'pw'
+        })
+        with self.app.app_context():
+            self.assertIsNone(db.session.scalar(db.select(User).filter_by(username='metrics')))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+# Query budgets of the views (query_budget.py)
+# Usage: python -m unittest discover tests
+import unittest
+
+from app_case import AppTestCase
+from models import db, User
+from query_budget import QueryBudgetExceeded, query_budget, query_problems
+
+INSERT = 'INSERT INTO outcome (user_id, amount) VALUES (?, ?)'
+
+
+class QueryProblemsTest(unittest.TestCase):
+    def test_statement_per_row_is_reported(self):
+        # What SQLAlchemy sends for an executemany it can not batch on SQLite
+        log = [(INSERT, (1, amount)) for amount in range(6)]
+        problems = query_problems(log, None, 5)
+        self.assertEqual(len(problems), 1)
+        self.assertIn('6 times with other parameters', problems[0])
+
+    def test_batch_is_one_statement(self):
+        log = [(INSERT, [(1, amount) for amount in range(50)]), ('SELECT 1', ())]
+        self.assertEqual(query_problems(log, 2, 5), [])
+
+    def test_over_budget(self):
+        self.assertEqual(query_problems([('SELECT 1', ())] * 3, 2, None), ['3 statements, budget 2'])
+
+
+class CommitTest(AppTestCase):
+    logged_in = False
+
+    def setUp(self):
+        super().setUp()
+        @self.app.route('/add/<int:count>')
+        @query_budget(2)
+        def add(count):
+            for i in range(count):
+                db.session.execute(db.insert(User).values(username=f'user{i}', name='User', password='-'))
+            db.session.commit()
+            db.session.scalar(db.select(User.id))
+            db.session.scalar(db.select(User.name))
+            return 'ok'
+
+    def users(self):
+        with self.app.app_context():
+            return db.session.scalar(db.select(db.func.count()).select_from(User))
+
+    def test_over_budget_fails_before_the_commit(self):
+        with self.assertRaises(QueryBudgetExceeded):
+            self.app.test_client().get('/add/3')
+        self.assertEqual(self.users(), 0)
+
+    def test_over_budget_after_the_commit_is_only_logged(self):
+        with self.assertLogs(self.app.logger, 'WARNING'):
+            self.assertEqual(self.app.test_client().get('/add/1').status_code, 200)
+        self.assertEqual(self.users(), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+# Amounts of the transactions and the running totals (balances.py)
+# Usage: python -m unittest discover tests
+import unittest
+
+from app_case import AppTestCase
+from balances import amount_value, reconcile_balances, rebuild_rollups
+from models import db, User, Income, Outcome, MonthlyTotal
+
+
+class TransactionAmountTest(AppTestCase):
+    def outcomes(self):
+        with self.app.app_context():
+            return db.session.scalars(db.select(Outcome.amount)).all(), db.session.scalar(db.select(User.total_outcome))
+
+    def test_form_stores_numbers(self):
+        self.client.post('/ana', data={'amount': '12.50', 'type': 'Food', 'description': 'Lunch'})
+        self.assertEqual(self.outcomes(), ([12.5], 12.5))
+
+    def test_form_rejects_amounts_that_are_not_numbers(self):
+        for amount in ('12,50', 'abc', 'nan', ''):
+            self.client.post('/ana', data={'amount': amount, 'type': 'Food', 'description': 'Lunch'})
+        self.assertEqual(self.outcomes(), ([], 0.0))
+
+    def test_api_rejects_amounts_that_are_not_numbers(self):
+        response = self.client.post('/api/v1/transactions', json=[{'kind': 'outcome', 'type': 'Food', 'amount': '12,50', 'description': 'Lunch'}])
+        self.assertEqual(response.get_json()['results'][0]['status'], 'error')
+        self.assertEqual(self.outcomes(), ([], 0.0))
+
+    def test_api_creates_a_batch_with_the_ids_of_every_item(self):
+        items = [
+            {'kind': 'outcome', 'type': 'Food', 'amount': 5, 'description': 'Lunch', 'date': '2024-01-02'},
+            {'kind': 'income', 'type': 'Salary', 'amount': 1000, 'description': 'January'},
+            {'kind': 'outcome', 'type': 'Food', 'amount': 'x', 'description': 'Lunch'},
+            {'kind': 'outcome', 'type': 'Transport', 'amount': 2.5, 'description': 'Bus', 'date': '2024-01-03'},
+            {'kind': 'outcome', 'type': 'Food', 'amount': 5, 'description': 'Lunch', 'date': '2024-01-02'},
+        ]
+        results = self.client.post('/api/v1/transactions', json=items).get_json()['results']
+        self.assertEqual([result['status'] for result in results], ['created', 'created', 'error', 'created', 'created'])
+
+        with self.app.app_context():
+            for item, result in zip(items, results):
+                if result['status'] == 'created':
+                    model = Income if item['kind'] == 'income' else Outcome
+                    row = db.session.get(model, result['id'])
+                    self.assertEqual((row.type, row.amount, row.description), (item['type'], item['amount'], item['description']))
+            self.assertEqual(db.session.execute(db.select(User.total_income, User.total_outcome)).one(), (1000.0, 12.5))
+
+    def test_api_updates_a_batch_with_mixed_fields(self):
+        items = [{'kind': 'outcome', 'type': 'Food', 'amount': 10 + i, 'description': f'row {i}', 'date': '2024-01-05'} for i in range(6)]
+        items.append({'kind': 'income', 'type': 'Salary', 'amount': 1000, 'description': 'January', 'date': '2024-01-31'})
+        ids = [result['id'] for result in self.client.post('/api/v1/transactions', json=items).get_json()['results']]
+
+        changes = [
+            {'kind': 'outcome', 'id': ids[0], 'description': 'renamed'},
+            {'kind': 'outcome', 'id': ids[1], 'type': 'Health', 'date': '2024-02-10'},
+            {'kind': 'outcome', 'id': ids[2], 'amount': 1},
+            {'kind': 'outcome', 'id': ids[3], 'description': 'renamed too'},
+            {'kind': 'outcome', 'id': ids[4], 'amount': 2, 'type': 'Transport'},
+            {'kind': 'outcome', 'id': ids[4], 'date': '2024-03-01'},
+            {'kind': 'income', 'id': ids[6], 'amount': 1500},
+            {'kind': 'outcome', 'id': 999, 'amount': 1},
+        ]
+        results = self.client.patch('/api/v1/transactions', json=changes).get_json()['results']
+        self.assertEqual([result['status'] for result in results], ['updated'] * 7 + ['error'])
+
+        with self.app.app_context():
+            rows = {row.id: (row.type, row.amount, row.description, row.date.isoformat())
+                    for row in db.session.scalars(db.select(Outcome))}
+            self.assertEqual(rows[ids[0]], ('Food', 10.0, 'renamed', '2024-01-05'))
+            self.assertEqual(rows[ids[1]], ('Health', 11.0, 'row 1', '2024-02-10'))
+            self.assertEqual(rows[ids[2]], ('Food', 1.0, 'row 2', '2024-01-05'))
+            self.assertEqual(rows[ids[4]], ('Transport', 2.0, 'row 4', '2024-03-01'))
+            self.assertEqual(reconcile_balances(), [])
+            rollup = db.session.execute(db.select(MonthlyTotal.month, MonthlyTotal.kind, MonthlyTotal.type, MonthlyTotal.total, MonthlyTotal.count)
+                                        .order_by(MonthlyTotal.month, MonthlyTotal.kind, MonthlyTotal.type)).all()
+            rebuild_rollups()
+            self.assertEqual(rollup, db.session.execute(db.select(MonthlyTotal.month, MonthlyTotal.kind, MonthlyTotal.type, MonthlyTotal.total, MonthlyTotal.count)
+                                                        .order_by(MonthlyTotal.month, MonthlyTotal.kind, MonthlyTotal.type)).all())
+
+    def test_amount_value_raises_on_bad_data(self):
+        self.assertEqual(amount_value(3), 3.0)
+        for value in ('12,50', '12.5', None, float('inf'), True):
+            with self.assertRaises(ValueError):
+                amount_value(value)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+# Identity cache of the workers (user_cache.py)
+# Usage: python -m unittest discover tests
+import unittest
+
+from app_case import AppTestCase
+import user_cache
+from models import db, User
+
+
+class UserCacheTest(AppTestCase):
+    config = {'USER_CACHE_TTL': 60}
+
+    def setUp(self):
+        super().setUp()
+        self.client.get('/ana')
+
+    def tearDown(self):
+        user_cache._users.clear()
+
+    # The changes below skip invalidate_user, like the ones done by other worker
+    def test_user_deleted_by_other_worker_is_logged_out(self):
+        with self.app.app_context():
+            db.session.execute(db.delete(User))
+            db.session.commit()
+
+        self.assertEqual(self.client.get('/api/v1/charts').status_code, 404)
+        self.assertEqual(self.client.get('/plot/ana').status_code, 404)
+        self.assertEqual(self.client.get('/ana').status_code, 302)
+        self.assertNotIn(1, user_cache._users)
+        self.assertEqual(self.client.get('/ana').headers['Location'], '/?next=%2Fana')
+
+    def test_user_renamed_by_other_worker_is_read_again(self):
+        with self.app.app_context():
+            db.session.execute(db.update(User).values(username='bea'))
+            db.session.commit()
+
+        self.assertEqual(self.client.get('/bea').status_code, 200)
+        self.assertEqual(self.client.get('/ana').status_code, 302)
+
+    def test_least_recently_used_are_evicted(self):
+        size = user_cache.USER_CACHE_SIZE
+        user_cache.USER_CACHE_SIZE = 2
+        try:
+            with self.app.app_context():
+                db.session.add_all([User(username=f'user{i}', name='User', password='-') for i in range(3)])
+                db.session.commit()
+                ids = db.session.scalars(db.select(User.id).order_by(User.id)).all()
+                user_cache._users.clear()
+                user_cache.get_user(ids[0], 60)
+                user_cache.get_user(ids[1], 60)
+                user_cache.get_user(ids[0], 60)
+                user_cache.get_user(ids[2], 60)
+            self.assertEqual(list(user_cache._users), [ids[0], ids[2]])
+        finally:
+            user_cache.USER_CACHE_SIZE = size
+
+
+if __name__ == '__main__':
+    unittest.main()
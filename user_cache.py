@@ -0,0 +1,65 @@
+import time
+import threading
+from collections import OrderedDict
+from flask_login import UserMixin
+from models import db, User
+from instrumentation import record_event
+
+
+# Maximum number of users kept by each worker, the least recently used are
+# dropped first
+USER_CACHE_SIZE = 10000
+
+# user_id -> (expiration time, CachedUser), least recently used first
+_users = OrderedDict()
+_lock = threading.Lock()
+
+
+# Identity of a logged in user (what Flask-Login keeps as current_user), it is
+# not attached to any session so it can be shared by the requests of a worker.
+# The transactions and the data version are always read from the database.
+class CachedUser(UserMixin):
+    def __init__(self, user):
+        self.id = user.id
+        self.username = user.username
+        self.name = user.name
+
+
+# Returns the identity of the user, querying the database only when it is not
+# cached or its ttl (seconds) expired. A ttl of 0 disables the cache. With
+# refresh the stored user is always read (the cache of a worker does not see
+# the renames and deletions done by the other workers)
+def get_user(user_id, ttl, refresh=False):
+    if not ttl:
+        user = db.session.get(User, user_id)
+        return CachedUser(user) if user else None
+
+    now = time.monotonic()
+    if not refresh:
+        with _lock:
+            entry = _users.get(user_id)
+            if entry and entry[0] > now:
+                _users.move_to_end(user_id)
+                record_event('user_cache_requests_total', result='hit')
+                return entry[1]
+        record_event('user_cache_requests_total', result='miss')
+
+    user = db.session.get(User, user_id)
+    if user is None:
+        invalidate_user(user_id)
+        return None
+
+    cached = CachedUser(user)
+    with _lock:
+        _users[user_id] = (now + ttl, cached)
+        _users.move_to_end(user_id)
+        while len(_users) > USER_CACHE_SIZE:
+            _users.popitem(last=False)
+
+    return cached
+
+
+# Must be called after the username/name of a user changes or the user is deleted
+def invalidate_user(user_id):
+    with _lock:
+        _users.pop(user_id, None)